@@ -5,7 +5,7 @@ This strategy demonstrates how to use LLM-based market analysis for trading deci
 The AI agent will analyze market data and generate trading signals autonomously.
 """
 
-from time import sleep
+import time
 from vn_qtrade.okx_engine import OKXEngine
 
 
@@ -22,19 +22,19 @@ def run(engine: OKXEngine):
     vt_symbols = ["BTC-USDT-SWAP.OKEX", "ETH-USDT-SWAP.OKEX"]
 
     # Subscribe to market data
-    sleep(1)  # Wait for connection to stabilize
+    # Wait for the contracts of all symbols to be loaded
+    if not engine.wait_ready(vt_symbols, timeout=10):
+        engine.write_log(f"Timed out waiting for contracts of {vt_symbols}, strategy stopped")
+        return
     engine.subscribe(vt_symbols)
     engine.offset = 0.1
 
-    # Configure SL/TP for risk management
+    # Configure SL/TP for risk management and get contract information
     engine.write_log("Configuring risk management...")
-    for vt_symbol in vt_symbols:
-        engine.sltp_cfg[vt_symbol] = {'stoploss': -0.05, 'takeprofit': 0.10}
-
-    # Get contract information
     engine.write_log("=== Contract Information ===")
-    for vt_symbol in vt_symbols:
-        contract = engine.get_contract(vt_symbol)
+    contracts = engine.get_contracts(vt_symbols)
+    for vt_symbol, contract in contracts.items():
+        engine.sltp_cfg[vt_symbol] = {'stoploss': -0.05, 'takeprofit': 0.10}
         if contract:
             engine.write_log(f"{vt_symbol}: {contract.name}, Min: {contract.min_volume}, Max: {contract.max_volume}")
 
@@ -61,6 +61,7 @@ def run(engine: OKXEngine):
 
     check_interval = 10  # Check status every 10 seconds
     check_counter = 0
+    next_t = time.monotonic()
 
     while engine.strategy_active:
         check_counter += 1
@@ -81,6 +82,8 @@ def run(engine: OKXEngine):
                     )
                 engine.write_log("-------------------------\n")
 
-        sleep(1)
+        # fixed 1s cadence, returns at once when the strategy is stopped
+        next_t += 1
+        engine.stop_event.wait(timeout=max(0, next_t - time.monotonic()))
 
     engine.write_log("LLM Trading Strategy stopped")
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
+import os
+import argparse
 import importlib
 from vn_qtrade import okx_engine
-importlib.reload(okx_engine)
+if os.getenv("VN_DEV_RELOAD"):
+    importlib.reload(okx_engine)
 
 import logging
 import time
@@ -36,10 +39,6 @@ try:
 except ImportError:
     raise
 
-import asyncio
-import nest_asyncio
-nest_asyncio.apply()
-
 SETTINGS["log.level"] = logging.INFO
 
 def init_engine():
@@ -67,25 +66,25 @@ def init_engine():
 
     return engine, ai_engine
 
-def main():
+def main(strategy="demo.py"):
 
     engine, ai_engine = init_engine()
 
     time.sleep(1)
-    engine.start_strategy('demo.py')
+    engine.start_strategy(strategy)
 
     engine.write_log("=== System Running ===")
     engine.write_log("Press Ctrl+C once to enter REPL")
     engine.write_log("Press Ctrl+C twice to exit")
 
-    # Start AI engine monitoring
-    while True:
-        if engine.monitor_thread.is_set():
-            embed(colors="Linux")
-            engine.monitor_thread.unset()
-        time.sleep(5)
+    # Block until Ctrl+C asks for the REPL
+    while engine.monitor_thread.wait():
+        embed(colors="Linux")
+        engine.monitor_thread.unset()
 
 
 if __name__ == '__main__':
-    #asyncio.get_event_loop().run_until_complete(main())
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", default="demo.py", help="strategy file to run, e.g. llm_strategy.py")
+    args = parser.parse_args()
+    main(args.strategy)
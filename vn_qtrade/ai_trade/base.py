@@ -2,8 +2,13 @@
 Base objects for AI Agent.
 """
 
+import atexit
+import logging
+import queue
+import threading
 from dataclasses import dataclass
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
 from vnpy_evo.trader.constant import Direction, Offset
 from vnpy_evo.trader.event import EVENT_LOG
@@ -11,8 +16,27 @@ from vnpy_evo.trader.event import EVENT_LOG
 # Define the new event type for AI signals
 EVENT_AI_SIGNAL = "eAiSignal"
 
+# AI agent logger, records are queued and written by a listener thread
+logger = logging.getLogger("ai_agent")
+logger.setLevel(logging.INFO)
+logger.propagate = False
 
-@dataclass
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s %(levelname)s] %(message)s"))
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# signal_id prefix is formatted once per second, a counter keeps ids unique
+_id_lock = threading.Lock()
+_id_prefix_sec = None
+_id_prefix_str = ""
+_id_counter = 0
+
+
+@dataclass(slots=True)
 class SignalData:
     """
     The data structure for carrying AI-generated trading signals.
@@ -37,5 +61,19 @@ class SignalData:
             self.datetime = datetime.now()
 
         if not self.signal_id:
-            self.signal_id = f"{self.datetime.strftime('%Y%m%d%H%M%S')}_{self.vt_symbol}"
+            self.signal_id = f"{_next_id_prefix(self.datetime)}_{self.vt_symbol}"
+
+
+def _next_id_prefix(dt: datetime) -> str:
+    """
+    Return "<YYYYmmddHHMMSS>_<counter>" for a new signal_id.
+    """
+    global _id_prefix_sec, _id_prefix_str, _id_counter
 
+    sec = dt.replace(microsecond=0)
+    with _id_lock:
+        if sec != _id_prefix_sec:
+            _id_prefix_sec = sec
+            _id_prefix_str = sec.strftime('%Y%m%d%H%M%S')
+        _id_counter += 1
+        return f"{_id_prefix_str}_{_id_counter:06d}"
@@ -5,11 +5,15 @@ The "Brain" of the AI trading system.
 """
 
 import asyncio
+import threading
+import time
+from collections import defaultdict
+from vnpy_evo.event import Event
 from vnpy_evo.trader.engine import BaseEngine, MainEngine, EventEngine
-from vnpy_evo.trader.event import EVENT_TICK
+from vnpy_evo.trader.event import EVENT_TICK, EVENT_POSITION, EVENT_ORDER, EVENT_ACCOUNT
 from vnpy_evo.trader.object import TickData
 
-from .base import EVENT_AI_SIGNAL, SignalData
+from .base import EVENT_AI_SIGNAL, SignalData, logger
 from .gi_llm_integration import TradingThinkingAgent
 from vnpy_evo.trader.constant import Direction
 
@@ -36,7 +40,32 @@ class AIAgentEngine(BaseEngine):
         # Configuration
         self.analysis_enabled = True
         self.thinking_interval = 5  # Analyze every 5 ticks
-        self.tick_counter = {}
+        self.consumer_count = 4     # Concurrent analyses
+
+        # Skip the LLM in quiet markets, see _should_invoke_llm
+        self.quiet_spread_bps = 5       # Max bid/ask spread treated as quiet
+        self.quiet_move_bps = 10        # Max price move since the last analysis
+        self.max_skip_interval = 60     # Seconds before a quiet symbol is analyzed again
+        self._last_invoke = {}          # vt_symbol -> (price, monotonic time, context signature)
+        self.tick_counter = defaultdict(int)
+
+        # Symbols being analyzed, latest tick and last finished analysis per symbol
+        self._in_flight = set()
+        self._latest_tick = {}
+        self._latest_analysis = {}
+
+        # Persistent event loop, ticks are queued to consumer tasks running on it
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self._tick_queue = None
+        self._consumers = []
+        asyncio.run_coroutine_threadsafe(self._start_consumers(), self._loop).result()
+
+        # Market context kept up to date by position/order/account events
+        self._ctx_positions = {}    # vt_symbol -> {vt_positionid: position dict}
+        self._ctx_orders = {}       # vt_symbol -> set of active vt_orderids
+        self._account_balances = {}
 
         self.register_event()
 
@@ -46,7 +75,7 @@ class AIAgentEngine(BaseEngine):
         """
         Write a log message.
         """
-        print(f"[AIAgentEngine] {msg}")
+        logger.info(msg)
 
     def log_info(self, msg: str) -> None:
         """Log info message."""
@@ -54,11 +83,11 @@ class AIAgentEngine(BaseEngine):
 
     def log_error(self, msg: str) -> None:
         """Log error message."""
-        print(f"[AIAgentEngine ERROR] {msg}")
+        logger.error(msg)
 
     def log_debug(self, msg: str) -> None:
         """Log debug message."""
-        print(f"[AIAgentEngine DEBUG] {msg}")
+        logger.debug(msg)
 
     def register_event(self) -> None:
         """
@@ -66,7 +95,33 @@ class AIAgentEngine(BaseEngine):
         The AI engine needs to listen to market data to make decisions.
         """
         #self.event_engine.register(EVENT_TICK, self.process_tick_event)
-        pass
+        self.event_engine.register(EVENT_POSITION, self.process_position_event)
+        self.event_engine.register(EVENT_ORDER, self.process_order_event)
+        self.event_engine.register(EVENT_ACCOUNT, self.process_account_event)
+
+    def process_position_event(self, event) -> None:
+        """Update the position part of the market context."""
+        p = event.data
+        self._ctx_positions.setdefault(p.vt_symbol, {})[p.vt_positionid] = {
+            "vt_symbol": p.vt_symbol,
+            "direction": p.direction.value,
+            "volume": p.volume,
+            "pnl": p.pnl
+        }
+
+    def process_order_event(self, event) -> None:
+        """Track active orders per symbol."""
+        order = event.data
+        orders = self._ctx_orders.setdefault(order.vt_symbol, set())
+        if order.is_active():
+            orders.add(order.vt_orderid)
+        else:
+            orders.discard(order.vt_orderid)
+
+    def process_account_event(self, event) -> None:
+        """Track account balances."""
+        account = event.data
+        self._account_balances[account.vt_accountid] = account.balance
 
     def process_tick_event(self, event) -> None:
         """
@@ -77,59 +132,113 @@ class AIAgentEngine(BaseEngine):
 
         # Update tick counter for this symbol
         vt_symbol = tick.vt_symbol
-        self.tick_counter[vt_symbol] = self.tick_counter.get(vt_symbol, 0) + 1
+        self.tick_counter[vt_symbol] += 1
+        self._latest_tick[vt_symbol] = tick
 
-        # Use LLM to analyze market and make decisions
-        if self.analysis_enabled:
+        if not self.analysis_enabled:
+            return
+
+        # Only analyze every thinking_interval ticks, one analysis per symbol at a time
+        if self.tick_counter[vt_symbol] % self.thinking_interval or vt_symbol in self._in_flight:
+            return
+
+        if not self._should_invoke_llm(tick):
+            return
+
+        self._in_flight.add(vt_symbol)
+        self._loop.call_soon_threadsafe(self._tick_queue.put_nowait, tick)
+
+    def _context_signature(self, vt_symbol: str) -> tuple:
+        """Cheap summary of the position/order context for change detection."""
+        positions = self._ctx_positions.get(vt_symbol, {})
+        return (
+            len(self._ctx_orders.get(vt_symbol, ())),
+            tuple(sorted((k, p["volume"]) for k, p in positions.items()))
+        )
+
+    def _should_invoke_llm(self, tick: TickData) -> bool:
+        """
+        Whether the tick is worth an LLM analysis.
+
+        Quiet ticks are skipped while the last analysis was hold/monitor: tight spread,
+        small move since the last analysis, unchanged positions/orders and not too long ago.
+        """
+        vt_symbol = tick.vt_symbol
+        now = time.monotonic()
+        signature = self._context_signature(vt_symbol)
+
+        last = self._last_invoke.get(vt_symbol)
+        analysis = self._latest_analysis.get(vt_symbol)
+        if last and analysis:
+            last_price, last_time, last_signature = last
+            action = analysis.get("decision", {}).get("action", "").lower()
+            price = tick.last_price
+            bid, ask = tick.bid_price_1, tick.ask_price_1
+
+            if (
+                action in ("hold", "monitor")
+                and signature == last_signature
+                and now - last_time < self.max_skip_interval
+                and price > 0 and last_price > 0
+                and bid > 0 and ask > 0
+                and (ask - bid) / price * 10000 < self.quiet_spread_bps
+                and abs(price - last_price) / last_price * 10000 < self.quiet_move_bps
+            ):
+                return False
+
+        self._last_invoke[vt_symbol] = (tick.last_price, now, signature)
+        return True
+
+    async def _start_consumers(self) -> None:
+        """Create the tick queue and consumer tasks on the engine loop."""
+        self._tick_queue = asyncio.Queue()
+        self._consumers = [
+            asyncio.get_running_loop().create_task(self._consumer())
+            for _ in range(self.consumer_count)
+        ]
+
+    async def _consumer(self) -> None:
+        """Analyze queued ticks and emit signals."""
+        while True:
+            tick = await self._tick_queue.get()
+            vt_symbol = tick.vt_symbol
             try:
                 # Get current context (positions, orders, etc.)
                 context = self._get_market_context(vt_symbol)
 
-                # Analyze market with LLM
-                analysis = asyncio.run(
-                    self.thinking_agent.analyze_market_situation(tick, context)
-                )
+                analysis = await self.thinking_agent.analyze_market_situation(tick, context)
+                self._latest_analysis[vt_symbol] = analysis
 
                 # Log analysis result
-                self.write_log(
+                self.log_debug(
                     f"LLM Analysis for {vt_symbol}: {analysis.get('decision', {}).get('rationale', 'No action')}"
                 )
 
-                # Generate trading signal if decision warrants action
-                signal = self.thinking_agent.get_trading_signal(analysis, tick)
+                # Generate trading signal with the freshest price
+                latest_tick = self._latest_tick.get(vt_symbol, tick)
+                signal = self.thinking_agent.get_trading_signal(analysis, latest_tick)
                 if signal:
                     self.generate_llm_signal(signal)
 
             except Exception as e:
-                self.write_log(f"Error in LLM analysis: {e}")
+                self.log_error(f"Error in LLM analysis: {e}")
                 # Fallback to simple threshold logic
                 self._fallback_tick_processing(tick)
+            finally:
+                self._in_flight.discard(vt_symbol)
 
     def _get_market_context(self, vt_symbol: str) -> dict:
         """Get current market context for analysis."""
         try:
-            positions = self.main_engine.get_all_positions()
-            orders = self.main_engine.get_all_active_orders()
-            accounts = self.main_engine.get_all_accounts()
-
+            balances = self._account_balances
             return {
-                "positions": [
-                    {
-                        "vt_symbol": p.vt_symbol,
-                        "direction": p.direction.value,
-                        "volume": p.volume,
-                        "pnl": p.pnl
-                    }
-                    for p in positions if p.vt_symbol == vt_symbol
-                ],
-                "active_orders": len([
-                    o for o in orders if o.vt_symbol == vt_symbol
-                ]),
-                "account_balance": accounts[0].balance if accounts else 0,
+                "positions": list(self._ctx_positions.get(vt_symbol, {}).values()),
+                "active_orders": len(self._ctx_orders.get(vt_symbol, ())),
+                "account_balance": next(iter(balances.values())) if balances else 0,
                 "analysis_time": self.tick_counter.get(vt_symbol, 0)
             }
         except Exception as e:
-            self.write_log(f"Error getting market context: {e}")
+            self.log_error(f"Error getting market context: {e}")
             return {}
 
     def _fallback_tick_processing(self, tick: TickData) -> None:
@@ -177,7 +286,7 @@ class AIAgentEngine(BaseEngine):
             rationale=rationale
         )
 
-        self.event_engine.put(EVENT_AI_SIGNAL, signal)
+        self.event_engine.put(Event(EVENT_AI_SIGNAL, signal))
         self.write_log(f"AI Agent [{agent_id}] generated signal: {direction.value} {volume} {vt_symbol} @ {price}")
 
     def close(self) -> None:
@@ -185,4 +294,11 @@ class AIAgentEngine(BaseEngine):
         Stop the engine.
         """
         # Unregister event listeners if needed
-        pass
+        try:
+            asyncio.run_coroutine_threadsafe(self.thinking_agent.close(), self._loop).result(timeout=5)
+        except Exception as e:
+            self.log_error(f"Error closing LLM client: {e}")
+
+        for task in self._consumers:
+            self._loop.call_soon_threadsafe(task.cancel)
+        self._loop.call_soon_threadsafe(self._loop.stop)
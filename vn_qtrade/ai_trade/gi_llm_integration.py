@@ -7,18 +7,58 @@ This module provides direct LLM API integration without external frameworks.
 
 import os
 import sys
+import math
+import time
 import asyncio
+import hashlib
+import importlib.util
 import json
+from collections import deque, OrderedDict
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from vnpy_evo.trader.constant import Direction
 from vnpy_evo.trader.object import TickData
 
+from .base import logger
+
 # Load environment variables from .env file
 load_dotenv()
 
+# System prompt for the LLM trading agent
+_SYSTEM_PROMPT = """你是一个专业的加密货币交易分析专家。
+
+你的任务是基于实时市场数据做出交易决策。请只返回一个JSON对象，不要使用markdown代码块，包含以下字段：
+
+{
+  "understanding": {
+    "market_regime": "趋势类型（trend_up/trend_down/sideways）",
+    "confidence": "置信度（0.0-1.0）",
+    "key_factors": ["关键因素1", "关键因素2"]
+  },
+  "decision": {
+    "action": "交易动作（buy/sell/hold/monitor）",
+    "rationale": "详细理由说明",
+    "risk_level": "风险级别（low/moderate/high）",
+    "expected_move": "预期走势"
+  },
+  "confidence": "整体置信度（0.0-1.0）"
+}
+
+重要原则：
+1. 只在有明确信号时建议买入或卖出
+2. 在市场不确定时保持观望
+3. 始终考虑风险管理
+4. 保持冷静理性，不受情绪影响
+5. 回答简洁明了，理由充分
+"""
+
 
 class TradingThinkingAgent:
     """
@@ -28,6 +68,14 @@ class TradingThinkingAgent:
     to analyze market data and generate trading decisions.
     """
 
+    # Strong actions and the direction they trade in
+    _DIRECTION_MAP = {
+        "buy": Direction.LONG,
+        "long": Direction.LONG,
+        "sell": Direction.SHORT,
+        "short": Direction.SHORT,
+    }
+
     def __init__(
         self,
         model_id: str = None,
@@ -47,20 +95,31 @@ class TradingThinkingAgent:
         self.api_base = api_base or os.getenv("LLM_API_BASE", "https://api.deepseek.com/v1")
         self.api_key = api_key or os.getenv("LLM_API_KEY", "")
         self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-        self.max_tokens = int(os.getenv("LLM_MAX_TOKENS", "2000"))
+        self.max_tokens = int(os.getenv("LLM_MAX_TOKENS", "800"))
         self.timeout = int(os.getenv("API_TIMEOUT_MS", "60000")) / 1000  # Convert to seconds
+        self.max_history = int(os.getenv("COGNITIVE_MAX_THOUGHT_HISTORY", "100"))
+        self.min_confidence = float(os.getenv("AI_MIN_CONFIDENCE", "0.6"))
+        self.cache_ttl = float(os.getenv("LLM_CACHE_TTL", "30"))
+        self.cache_size = int(os.getenv("LLM_CACHE_SIZE", "256"))
+        self.cache_price_step = float(os.getenv("LLM_CACHE_PRICE_BPS", "5")) / 10000
+        # price buckets need a positive step, the decision cache is off otherwise
+        self.use_decision_cache = self.cache_price_step > 0
+        if not self.use_decision_cache:
+            logger.warning(
+                "[TradingThinkingAgent] LLM_CACHE_PRICE_BPS must be positive, decision cache disabled"
+            )
 
-        # Print configuration
-        print(f"\n{'='*60}")
-        print("Native LLM Trading Agent - Configuration")
-        print(f"{'='*60}")
-        print(f"Model ID: {self.model_id}")
-        print(f"API Base: {self.api_base}")
-        print(f"API Key: {'*' * (len(self.api_key) - 4) + self.api_key[-4:] if len(self.api_key) > 4 else 'Not set'}")
-        print(f"Temperature: {self.temperature}")
-        print(f"Max Tokens: {self.max_tokens}")
-        print(f"Timeout: {self.timeout}s")
-        print(f"{'='*60}\n")
+        # Log configuration
+        logger.info(
+            "[TradingThinkingAgent] Model ID: %s, API Base: %s, API Key: %s, "
+            "Temperature: %s, Max Tokens: %s, Timeout: %ss",
+            self.model_id,
+            self.api_base,
+            '*' * (len(self.api_key) - 4) + self.api_key[-4:] if len(self.api_key) > 4 else 'Not set',
+            self.temperature,
+            self.max_tokens,
+            self.timeout
+        )
 
         # Initialize client if possible
         self.client = None
@@ -68,21 +127,40 @@ class TradingThinkingAgent:
 
         if self.has_api_key:
             try:
+                import httpx
                 from openai import AsyncOpenAI
+
+                # Keep connections alive between analyses, HTTP/2 when h2 is installed
+                http_client = httpx.AsyncClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(
+                        max_connections=64,
+                        max_keepalive_connections=64,
+                        keepalive_expiry=120
+                    ),
+                    timeout=self.timeout
+                )
                 self.client = AsyncOpenAI(
                     api_key=self.api_key,
-                    base_url=self.api_base
+                    base_url=self.api_base,
+                    http_client=http_client
                 )
-                print("[TradingThinkingAgent] ✓ LLM client initialized")
+                logger.info("[TradingThinkingAgent] ✓ LLM client initialized")
             except Exception as e:
-                print(f"[TradingThinkingAgent] ⚠ Failed to initialize LLM client: {e}")
+                logger.warning(f"[TradingThinkingAgent] ⚠ Failed to initialize LLM client: {e}")
                 self.has_api_key = False
         else:
-            print("[TradingThinkingAgent] ℹ No API key found - using rule-based mode")
+            logger.info("[TradingThinkingAgent] ℹ No API key found - using rule-based mode")
 
         # Market data cache
         self.market_data_cache = {}
-        self.thought_history = []
+        self.thought_history = deque(maxlen=self.max_history)
+
+        # (symbol, price bucket, context hash) -> (expire time, analysis)
+        self.decision_cache = OrderedDict()
+
+        # Constant system message shared by every request
+        self._system_message = {"role": "system", "content": _SYSTEM_PROMPT}
 
     async def analyze_market_situation(
         self,
@@ -108,13 +186,28 @@ class TradingThinkingAgent:
             "timestamp": tick.datetime
         }
 
+        # Serialize the context once for both the cache key and the prompt
+        context = context or {}
+        context_json = self._dumps_context(context)
+
+        # Reuse a recent decision for the same price bucket and context
+        cache_key = self._get_cache_key(tick, context_json) if self.use_decision_cache else None
+        cached = self.decision_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.decision_cache.move_to_end(cache_key)
+                return cached[1]
+            del self.decision_cache[cache_key]
+
         # Build analysis prompt
-        analysis_prompt = self._build_analysis_prompt(tick, context or {})
+        analysis_prompt = self._build_analysis_prompt(tick, context_json)
 
         try:
             # Use native LLM for analysis
             if self.has_api_key and self.client:
-                result = await self._call_llm_analysis(analysis_prompt, context or {})
+                result = await self._call_llm_analysis(analysis_prompt, context)
+                if cache_key:
+                    self._cache_decision(cache_key, result)
             else:
                 result = await self._fallback_reasoning(analysis_prompt)
 
@@ -126,19 +219,46 @@ class TradingThinkingAgent:
                 "price": tick.last_price
             })
 
-            # Limit history size
-            max_history = int(os.getenv("COGNITIVE_MAX_THOUGHT_HISTORY", "100"))
-            if len(self.thought_history) > max_history:
-                self.thought_history = self.thought_history[-max_history:]
-
             return result
 
         except Exception as e:
-            print(f"[TradingThinkingAgent] Error in analysis: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[TradingThinkingAgent] Error in analysis: {e}")
             return self._get_default_analysis(tick)
 
+    @staticmethod
+    def _dumps_context(context: Dict[str, Any]) -> str:
+        """Serialize the market context with sorted keys."""
+        # analysis_time changes on every tick and must not break cache hits
+        stable_context = {k: v for k, v in context.items() if k != "analysis_time"}
+        if orjson:
+            return orjson.dumps(stable_context, default=str, option=orjson.OPT_SORT_KEYS).decode()
+        return json.dumps(stable_context, ensure_ascii=False, sort_keys=True, default=str)
+
+    def _get_cache_key(self, tick: TickData, context_json: str) -> tuple:
+        """Build the decision cache key from the quantized price and context."""
+        price = tick.last_price
+        bucket = int(math.log(price) / math.log1p(self.cache_price_step)) if price > 0 else 0
+
+        digest = hashlib.blake2b(context_json.encode(), digest_size=8).hexdigest()
+        return (tick.vt_symbol, bucket, digest)
+
+    def _cache_decision(self, key: tuple, analysis: Dict[str, Any]) -> None:
+        """Store an LLM decision, evicting the least recently used entry."""
+        self.decision_cache[key] = (time.monotonic() + self.cache_ttl, analysis)
+        self.decision_cache.move_to_end(key)
+        if len(self.decision_cache) > self.cache_size:
+            self.decision_cache.popitem(last=False)
+
+    def clear_decision_cache(self):
+        """Drop all cached decisions."""
+        self.decision_cache.clear()
+
+    async def close(self) -> None:
+        """Close the LLM client and its connection pool."""
+        if self.client:
+            await self.client.close()
+            self.client = None
+
     async def _call_llm_analysis(
         self,
         prompt: str,
@@ -147,38 +267,13 @@ class TradingThinkingAgent:
         """Call native LLM for market analysis."""
         try:
             # Prepare messages for LLM
-            messages = [
-                {
-                    "role": "system",
-                    "content": self._get_system_prompt()
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-
-            # Make async LLM call
-            response = await self.client.chat.completions.create(
-                model=self.model_id,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                timeout=self.timeout
-            )
+            messages = [self._system_message, {"role": "user", "content": prompt}]
 
-            # Parse LLM response
-            llm_response = response.choices[0].message.content
-
-            # Extract JSON from markdown code blocks if present
-            import re
-            json_match = re.search(r'```(?:json)?\s*\n?({.*?})\n?```', llm_response, re.DOTALL)
-            if json_match:
-                llm_response = json_match.group(1)
+            # Make async LLM call, concurrent calls share the client's connection pool
+            llm_response = await self._create_completion(messages)
 
             # Try to parse as JSON
             try:
-                import json
                 result = json.loads(llm_response)
 
                 # Validate and normalize the result
@@ -193,7 +288,8 @@ class TradingThinkingAgent:
                 return result
 
             except json.JSONDecodeError:
-                # If not JSON, create structured response
+                # JSON mode should prevent this, create structured response
+                logger.warning(f"[TradingThinkingAgent] Non-JSON LLM response: {llm_response[:200]}")
                 return {
                     "reasoning_type": "native_llm",
                     "raw_response": llm_response,
@@ -206,37 +302,68 @@ class TradingThinkingAgent:
                 }
 
         except Exception as e:
-            print(f"[TradingThinkingAgent] LLM call failed: {e}")
+            logger.error(f"[TradingThinkingAgent] LLM call failed: {e}")
             raise
 
-    def _get_system_prompt(self) -> str:
-        """Get system prompt for LLM trading agent."""
-        return """你是一个专业的加密货币交易分析专家。
-
-你的任务是基于实时市场数据做出交易决策。请始终以JSON格式返回分析结果，包含以下字段：
+    async def _create_completion(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Make one streamed chat completion call and return the message content.
 
-{
-  "understanding": {
-    "market_regime": "趋势类型（trend_up/trend_down/sideways）",
-    "confidence": "置信度（0.0-1.0）",
-    "key_factors": ["关键因素1", "关键因素2"]
-  },
-  "decision": {
-    "action": "交易动作（buy/sell/hold/monitor）",
-    "rationale": "详细理由说明",
-    "risk_level": "风险级别（low/moderate/high）",
-    "expected_move": "预期走势"
-  },
-  "confidence": "整体置信度（0.0-1.0）"
-}
+        The stream is closed as soon as the first top-level JSON object is
+        complete, so trailing text is neither waited for nor returned.
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.model_id,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            timeout=self.timeout,
+            response_format={"type": "json_object"},
+            stream=True
+        )
+
+        parts = []
+        start = None        # offset of the first '{' in the response
+        depth = 0
+        in_string = False
+        escaped = False
+        offset = 0
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+
+                for i, ch in enumerate(delta):
+                    if in_string:
+                        if escaped:
+                            escaped = False
+                        elif ch == "\\":
+                            escaped = True
+                        elif ch == '"':
+                            in_string = False
+                    elif ch == '"':
+                        in_string = start is not None
+                    elif ch == "{":
+                        if start is None:
+                            start = offset + i
+                        depth += 1
+                    elif ch == "}" and depth:
+                        depth -= 1
+                        if not depth:
+                            return "".join(parts)[start:offset + i + 1]
+                offset += len(delta)
+        finally:
+            await stream.close()
+
+        return "".join(parts)
 
-重要原则：
-1. 只在有明确信号时建议买入或卖出
-2. 在市场不确定时保持观望
-3. 始终考虑风险管理
-4. 保持冷静理性，不受情绪影响
-5. 回答简洁明了，理由充分
-"""
+    def _get_system_prompt(self) -> str:
+        """Get system prompt for LLM trading agent."""
+        return _SYSTEM_PROMPT
 
     async def _fallback_reasoning(self, prompt: str) -> Dict[str, Any]:
         """Fallback reasoning when LLM is not available."""
@@ -256,7 +383,7 @@ class TradingThinkingAgent:
             }
         }
 
-    def _build_analysis_prompt(self, tick: TickData, context: Dict[str, Any]) -> str:
+    def _build_analysis_prompt(self, tick: TickData, context_json: str) -> str:
         """Build comprehensive analysis prompt from market data."""
         prompt = f"""
         分析以下加密货币市场数据并做出交易决策：
@@ -270,7 +397,7 @@ class TradingThinkingAgent:
         - 时间: {tick.datetime}
 
         市场上下文：
-        {json.dumps(context, ensure_ascii=False, indent=2)}
+        {context_json}
 
         请基于以下框架进行分析：
         1. 市场态势理解（趋势、震荡、突破等）
@@ -300,17 +427,13 @@ class TradingThinkingAgent:
         action = decision.get("action", "hold").lower()
 
         # Only trade on strong signals
-        strong_actions = ["buy", "sell", "long", "short"]
-
-        # Check if action is in strong actions
-        if action not in strong_actions:
+        if action not in self._DIRECTION_MAP:
             return False
 
         # Check confidence threshold
         confidence = analysis.get("confidence", 0.0)
-        min_confidence = float(os.getenv("AI_MIN_CONFIDENCE", "0.6"))
 
-        if confidence < min_confidence:
+        if confidence < self.min_confidence:
             return False
 
         # Check risk level
@@ -327,22 +450,11 @@ class TradingThinkingAgent:
         Returns:
             Trading signal dict or None
         """
-        if not self.should_trade(analysis):
-            return None
-
         decision = analysis.get("decision", {})
-        action = decision.get("action", "").lower()
-
-        # Map action to direction
-        direction_map = {
-            "buy": Direction.LONG,
-            "long": Direction.LONG,
-            "sell": Direction.SHORT,
-            "short": Direction.SHORT,
-        }
 
-        direction = direction_map.get(action)
-        if not direction:
+        # Map action to direction, most analyses are hold/monitor and stop here
+        direction = self._DIRECTION_MAP.get(decision.get("action", "").lower())
+        if not direction or not self.should_trade(analysis):
             return None
 
         # Extract or calculate trade parameters
@@ -362,8 +474,8 @@ class TradingThinkingAgent:
 
     def get_thought_history(self) -> List[Dict[str, Any]]:
         """Get the complete thought history."""
-        return self.thought_history
+        return list(self.thought_history)
 
     def clear_history(self):
         """Clear thought history."""
-        self.thought_history = []
+        self.thought_history.clear()
@@ -1,5 +1,7 @@
 
 import importlib
+import importlib.util
+import os
 import sys
 import traceback
 from typing import Sequence, Any
@@ -11,8 +13,11 @@ import signal
 from threading import Thread
 from functools import partial
 import atexit
+import queue
+import weakref
 from dataclasses import dataclass, field
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
@@ -36,7 +41,9 @@ from vnpy_evo.trader.event import (
     EVENT_TICK,
     EVENT_ORDER,
     EVENT_TRADE,
-    EVENT_POSITION
+    EVENT_POSITION,
+    EVENT_ACCOUNT,
+    EVENT_CONTRACT
 )
 from vnpy_evo.trader.constant import (
     Direction,
@@ -47,30 +54,45 @@ from vnpy_evo.trader.constant import (
     Status
 )
 
-from vnpy_evo.trader.utility import load_json, save_json, extract_vt_symbol, round_to
-from .utils import get_data
+from vnpy_evo.trader.utility import round_to
+from .utils import get_one, get_many, to_df, load_json, save_json, extract_vt_symbol
 from concurrent.futures import ThreadPoolExecutor
 
 from copy import copy
 from tzlocal import get_localzone
 
-import inspect 
-
 def get_debug_info():
-    stack_t = inspect.stack()
-    #stack_info = stack_t[1]
-    t = stack_t[2]
-    return f"{t.filename} {t.lineno} {t.function}"
+    # caller of the caller, without materializing the whole stack
+    f = sys._getframe(2)
+    return f"{f.f_code.co_filename} {f.f_lineno} {f.f_code.co_name}"
 LOCAL_TZ = get_localzone()
 
 import ccxt
 
 APP_NAME = "CryptoTrader"
 
+# top of book fields kept per subscribed symbol, ts in milliseconds
+TICK_DTYPE = np.dtype([
+    ("last", "f8"),
+    ("ask1", "f8"),
+    ("bid1", "f8"),
+    ("ask_vol1", "f8"),
+    ("bid_vol1", "f8"),
+    ("ts", "i8"),
+])
+
 EVENT_CRYPTO_LOG = "eCryptoLog"
 
+# action name -> (direction, offset) for CryptoEngineBase.place
+ORDER_ACTIONS = {
+    "buy": (Direction.LONG, Offset.OPEN),
+    "sell": (Direction.SHORT, Offset.CLOSE),
+    "short": (Direction.SHORT, Offset.OPEN),
+    "cover": (Direction.LONG, Offset.CLOSE),
+}
 
-@dataclass
+
+@dataclass(slots=True)
 class TTOrder:
     vt_symbol: str
     direction: Direction
@@ -84,12 +106,30 @@ class TTOrder:
 
 
 
+@dataclass
+class Snapshot:
+    """
+    Accounts, positions and active orders taken together.
+    """
+    accounts: Any
+    positions: Any
+    active_orders: Any
+
+
 class WorkingThread(threading.Thread):
-    def __init__(self, *kargs, **kwargs):
+    def __init__(self, *kargs, cpu_affinity: Sequence[int] = None, **kwargs):
         threading.Thread.__init__(self, *kargs, **kwargs)
 
         # event for manual debug
         self.dbg_event = threading.Event()
+        # cpus the thread is pinned to (Linux only), None for no pinning
+        self.cpu_affinity = cpu_affinity
+
+    def run(self):
+        if self.cpu_affinity and hasattr(os, "sched_setaffinity"):
+            # pid 0 is the calling thread
+            os.sched_setaffinity(0, set(self.cpu_affinity))
+        super().run()
 
     def set(self):
         return self.dbg_event.set()
@@ -100,27 +140,189 @@ class WorkingThread(threading.Thread):
     def is_set(self):
         return self.dbg_event.is_set()
 
+    def wait(self, timeout=None):
+        return self.dbg_event.wait(timeout)
+
 class CryptoEngineBase(BaseEngine):
-    """"""
+    """
+    Getters return vnpy objects by default, pass use_df=True for a DataFrame.
+    """
     setting_filename = "crypto_trader_setting.json"
 
+    # engines cleaned up at exit, the atexit hook is registered only once
+    _live_engines = weakref.WeakSet()
+    _atexit_registered = False
+
     def __init__(self, main_engine: MainEngine, event_engine: EventEngine, terminal:bool=True):
         """"""
         super().__init__(main_engine, event_engine, APP_NAME)
 
+        # log lines are printed and published by a drain thread
+        self._log_queue = queue.SimpleQueue()
+        self._log_thread = Thread(target=self._drain_logs, daemon=True)
+        self._log_thread.start()
+
         self.strategy_active = False
         self.strategy_thread = None
+        # set by stop_strategy, strategies sleep on it to stop promptly
+        self.stop_event = threading.Event()
+        # script path -> ((mtime_ns, size), module), scripts are re-executed only when edited
+        self._loaded_modules = {}
 
         self.contracts = None
         self.DEBUG = True
-
+        # e.g. {"cpu_affinity": [3]} pins the strategy thread to isolated cpus
+        self.setting = load_json(self.setting_filename)
+
+        # latest data pushed by the event bus, seeded from the OMS for an
+        # engine created after the gateway has connected
+        main_engine = self.main_engine
+        self._ticks = {t.vt_symbol: t for t in main_engine.get_all_ticks()}
+        self._positions = {p.vt_positionid: p for p in main_engine.get_all_positions()}
+        # vt_symbol -> {vt_positionid: position}, long and short legs of one symbol
+        self._symbol_positions = {}
+        for position in self._positions.values():
+            self._symbol_positions.setdefault(position.vt_symbol, {})[position.vt_positionid] = position
+        self._accounts = {a.vt_accountid: a for a in main_engine.get_all_accounts()}
+        self._active_orders = {o.vt_orderid: o for o in main_engine.get_all_active_orders()}
+        # vt_symbol -> contract, kept up to date by EVENT_CONTRACT
+        self._contracts = {c.vt_symbol: c for c in self.main_engine.get_all_contracts()}
+        # (vt_symbol, direction, offset, order_type) -> template OrderRequest
+        self._req_templates = {}
+        # vt_orderid -> {vt_tradeid: trade}
+        self._order_trades = {}
+        for trade in self.main_engine.get_all_trades():
+            self._order_trades.setdefault(trade.vt_orderid, {})[trade.vt_tradeid] = trade
+        # subscribed symbols -> row of the top of book table
+        self._sym_to_idx = {}
+        self._tick_arr = np.zeros(0, dtype=TICK_DTYPE)
+        # bumped on every tick, wait_tick waits for it to move past the last seen value
+        self._tick_cond = threading.Condition()
+        self._tick_seq = 0
+        self._tick_seen = 0
+        # DataFrames are rebuilt only when the collection version changes
+        self._versions = {"positions": 0, "accounts": 0, "active_orders": 0}
+        self._df_cache = {}
+
+        self.event_engine.register(EVENT_TICK, self._on_tick)
+        self.event_engine.register(EVENT_POSITION, self._on_position)
+        self.event_engine.register(EVENT_ACCOUNT, self._on_account)
+        self.event_engine.register(EVENT_ORDER, self._on_order)
+        self.event_engine.register(EVENT_TRADE, self._on_trade)
+        # notified on every contract pushed by the gateway, wait_ready waits on it
+        self._contracts_cond = threading.Condition()
+        self.event_engine.register(EVENT_CONTRACT, self._on_contract)
+
+        # never started, only carries the debug event set by Ctrl+c
+        self.monitor_thread = WorkingThread()
+        self.monitor_event = self.monitor_thread.dbg_event
         if terminal:
-            self.monitor_thread =  WorkingThread(
-                target=self.monitor)
-            self.monitor_thread.start()
             signal.signal(signal.SIGINT, self.debug_handler)
 
-        atexit.register(self.cleanup)
+        CryptoEngineBase._live_engines.add(self)
+        if not CryptoEngineBase._atexit_registered:
+            atexit.register(CryptoEngineBase._cleanup_all)
+            CryptoEngineBase._atexit_registered = True
+
+    def _on_tick(self, event: Event):
+        tick = event.data
+        self._ticks[tick.vt_symbol] = tick
+        i = self._sym_to_idx.get(tick.vt_symbol)
+        if i is not None:
+            self._tick_arr[i] = (
+                tick.last_price,
+                tick.ask_price_1,
+                tick.bid_price_1,
+                tick.ask_volume_1,
+                tick.bid_volume_1,
+                int(tick.datetime.timestamp() * 1000)
+            )
+        with self._tick_cond:
+            self._tick_seq += 1
+            self._tick_cond.notify_all()
+
+    def _on_position(self, event: Event):
+        position = event.data
+        self._positions[position.vt_positionid] = position
+        self._symbol_positions.setdefault(position.vt_symbol, {})[position.vt_positionid] = position
+        self._versions["positions"] += 1
+
+    def _on_account(self, event: Event):
+        account = event.data
+        self._accounts[account.vt_accountid] = account
+        self._versions["accounts"] += 1
+
+    def _on_order(self, event: Event):
+        order = event.data
+        if order.is_active():
+            self._active_orders[order.vt_orderid] = order
+        else:
+            self._active_orders.pop(order.vt_orderid, None)
+        self._versions["active_orders"] += 1
+
+    def _on_trade(self, event: Event):
+        trade = event.data
+        self._order_trades.setdefault(trade.vt_orderid, {})[trade.vt_tradeid] = trade
+
+    def _get_collection(self, name: str, use_df: bool):
+        """
+        Return all objects of a cached collection, the DataFrame is reused
+        until an event changes the collection (do not modify it in place).
+        """
+        data = list(getattr(self, f"_{name}").values())
+        if not use_df:
+            return data
+
+        version = self._versions[name]
+        cached = self._df_cache.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        df = to_df(data)
+        self._df_cache[name] = (version, df)
+        return df
+
+    def _on_contract(self, event: Event):
+        contract = event.data
+        with self._contracts_cond:
+            self._contracts[contract.vt_symbol] = contract
+            self._contracts_cond.notify_all()
+
+    def wait_ready(self, vt_symbols: Sequence[str] = None, timeout: float = 5) -> bool:
+        """
+        Block until the contracts of vt_symbols (any contract if None) are loaded,
+        return False on timeout.
+        """
+        contracts = self._contracts
+
+        def ready() -> bool:
+            if vt_symbols is None:
+                return bool(contracts or self.main_engine.get_all_contracts())
+            for vt_symbol in vt_symbols:
+                if vt_symbol not in contracts:
+                    # pushed before the handler was registered
+                    contract = self.main_engine.get_contract(vt_symbol)
+                    if contract is None:
+                        return False
+                    contracts[vt_symbol] = contract
+            return True
+
+        with self._contracts_cond:
+            return self._contracts_cond.wait_for(ready, timeout)
+
+    def wait_tick(self, timeout: float = None) -> bool:
+        """
+        Block until a tick arrives after the previous call returned (or the
+        strategy is stopped), return False on timeout.
+        """
+        with self._tick_cond:
+            received = self._tick_cond.wait_for(
+                lambda: self._tick_seq != self._tick_seen or self.stop_event.is_set(),
+                timeout
+            )
+            # ticks counted up to here are consumed, later ones wake the next call
+            self._tick_seen = self._tick_seq
+        return received
 
     def debug_handler(self, signum, frame):
         try:
@@ -133,48 +335,66 @@ class CryptoEngineBase(BaseEngine):
             self.write_log(f'error: {e}')
             exit(-1)
 
-    def monitor(self):
-        while True:
-            time.sleep(5)
-
     def init(self):
         """
         Start script engine.
         """
         pass
 
-    def start_strategy(self, script_path: str):
+    def start_strategy(self, script_path: str, reload: bool = False):
         """
         Start running strategy function in strategy_thread.
+        reload=True re-executes the script even if unchanged, for dev only.
         """
         if self.strategy_active:
             return
         self.strategy_active = True
+        self.stop_event.clear()
 
         self.strategy_thread = WorkingThread(
-            target=self.run_strategy, args=(script_path,))
+            target=self.run_strategy, args=(script_path, reload),
+            cpu_affinity=self.setting.get("cpu_affinity"))
         self.strategy_thread.start()
 
         self.write_log("策略交易脚本启动")
 
-    def run_strategy(self, script_path: str):
+    def run_strategy(self, script_path: str, reload: bool = False):
         """
         Load strategy script and call the run function.
+
+        run(engine) should loop while engine.strategy_active and sleep with
+        engine.stop_event.wait() or engine.wait_tick(), both wake on stop.
         """
-        path = Path(script_path)
-        sys.path.append(str(path.parent))
+        path = Path(script_path).resolve()
+        if str(path.parent) not in sys.path:
+            sys.path.append(str(path.parent))
 
         script_name = path.parts[-1]
         module_name = script_name.replace(".py", "")
 
         try:
-            module = importlib.import_module(module_name)
-            importlib.reload(module)
+            module = self.load_strategy_module(path, module_name, reload=reload)
             module.run(self)
         except:     # noqa
             msg = f"触发异常已停止\n{traceback.format_exc()}"
             self.write_log(msg)
 
+    def load_strategy_module(self, path: Path, module_name: str, reload: bool = False):
+        """
+        Load the strategy script, reusing the loaded module if the file is unchanged.
+        """
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._loaded_modules.get(str(path))
+        if not reload and cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self._loaded_modules[str(path)] = (stamp, module)
+        return module
+
     def stop_strategy(self):
         """
         Stop the running strategy.
@@ -182,9 +402,15 @@ class CryptoEngineBase(BaseEngine):
         if not self.strategy_active:
             return
         self.strategy_active = False
+        self.stop_event.set()
+        # wake strategies blocked in wait_tick
+        with self._tick_cond:
+            self._tick_cond.notify_all()
 
         if self.strategy_thread:
-            self.strategy_thread.join()
+            self.strategy_thread.join(timeout=5)
+            if self.strategy_thread.is_alive():
+                self.write_log("策略脚本未在5秒内退出，请在循环中检查strategy_active或stop_event")
         self.strategy_thread = None
 
         self.write_log("策略交易脚本停止")
@@ -203,33 +429,82 @@ class CryptoEngineBase(BaseEngine):
         order_type: OrderType
     ) -> str:
         """"""
-        contract = self.get_contract(vt_symbol)
+        contract = self._contracts.get(vt_symbol) or self.main_engine.get_contract(vt_symbol)
         if not contract:
             return ""
 
-        req = OrderRequest(
-            symbol=contract.symbol,
-            exchange=contract.exchange,
-            direction=direction,
-            type=order_type,
-            volume=volume,
-            price=price,
-            offset=offset
-        )
+        key = (vt_symbol, direction, offset, order_type)
+        template = self._req_templates.get(key)
+        if template is None:
+            template = OrderRequest(
+                symbol=contract.symbol,
+                exchange=contract.exchange,
+                direction=direction,
+                type=order_type,
+                volume=volume,
+                price=price,
+                offset=offset
+            )
+            self._req_templates[key] = template
+
+        # a shallow copy keeps fields derived in __post_init__ (e.g. vt_symbol)
+        req = copy(template)
+        req.price = price
+        req.volume = volume
 
         vt_orderid = self.main_engine.send_order(req, contract.gateway_name)
         return vt_orderid
 
     def subscribe(self, vt_symbols):
-        """"""
-        for vt_symbol in vt_symbols:
-            contract = self.main_engine.get_contract(vt_symbol)
+        """
+        Subscribe market data, symbols already subscribed are skipped so
+        callers never send duplicate subscribe requests to the gateway.
+        """
+        get_contract = self.main_engine.get_contract
+        contracts = {}
+        for vt_symbol in dict.fromkeys(vt_symbols):
+            if vt_symbol in self._sym_to_idx:
+                continue
+            # symbols without a contract yet stay unsubscribed and are retried next call
+            contract = self._contracts.get(vt_symbol) or get_contract(vt_symbol)
             if contract:
-                req = SubscribeRequest(
-                    symbol=contract.symbol,
-                    exchange=contract.exchange
-                )
-                self.main_engine.subscribe(req, contract.gateway_name)
+                contracts[vt_symbol] = contract
+        if not contracts:
+            return
+
+        n = len(self._sym_to_idx)
+        tick_arr = np.zeros(n + len(contracts), dtype=TICK_DTYPE)
+        tick_arr[:n] = self._tick_arr
+        # swap the table before publishing new rows to the tick handler
+        self._tick_arr = tick_arr
+        for i, vt_symbol in enumerate(contracts, n):
+            self._sym_to_idx[vt_symbol] = i
+
+        # one after another, the gateway subscribe path is not meant to be called concurrently
+        for contract in contracts.values():
+            self._subscribe_contract(contract)
+
+    def _subscribe_contract(self, contract: ContractData) -> None:
+        """"""
+        req = SubscribeRequest(
+            symbol=contract.symbol,
+            exchange=contract.exchange
+        )
+        self.main_engine.subscribe(req, contract.gateway_name)
+
+    def place(
+        self,
+        vt_symbol: str,
+        price: float,
+        volume: float,
+        action: str,
+        order_type: OrderType = OrderType.LIMIT
+    ) -> str:
+        """
+        Send order by action name (buy/sell/short/cover) in a single call.
+        """
+        direction, offset = ORDER_ACTIONS[action]
+        return self.send_order(vt_symbol, price, volume, direction, offset, order_type)
 
     def buy(self, vt_symbol: str, price: float, volume: float, order_type: OrderType = OrderType.LIMIT) -> str:
         """"""
@@ -258,14 +533,32 @@ class CryptoEngineBase(BaseEngine):
 
     def get_tick(self, vt_symbol: str, use_df: bool = False) -> TickData:
         """"""
-        return get_data(self.main_engine.get_tick, arg=vt_symbol, use_df=use_df)
+        if not use_df:
+            return self._ticks.get(vt_symbol)
+        return get_one(self._ticks.get, arg=vt_symbol, use_df=True)
+
+    def get_tick_fast(self, vt_symbol: str):
+        """
+        Return the top of book record of a subscribed symbol (last, ask1, bid1,
+        ask_vol1, bid_vol1, ts), fields are zero until the first tick arrives.
+        """
+        return self._tick_arr[self._sym_to_idx[vt_symbol]]
+
+    def get_tick_table(self, use_df: bool = True):
+        """
+        Return the top of book table of all subscribed symbols, one row per symbol.
+        """
+        tick_arr = self._tick_arr
+        if not use_df:
+            return tick_arr.copy()
+        # the tick handler writes rows in place, hand out a copy of the columns
+        index = pd.Index(list(self._sym_to_idx)[:len(tick_arr)], name="vt_symbol")
+        return DataFrame({name: tick_arr[name] for name in TICK_DTYPE.names}, index=index, copy=True)
 
     def get_ticks(self, vt_symbols: Sequence[str], use_df: bool = False) -> Sequence[TickData]:
         """"""
-        ticks = []
-        for vt_symbol in vt_symbols:
-            tick = self.main_engine.get_tick(vt_symbol)
-            ticks.append(tick)
+        get = self._ticks.get
+        ticks = [get(vt_symbol) for vt_symbol in vt_symbols]
 
         if not use_df:
             return ticks
@@ -274,14 +567,14 @@ class CryptoEngineBase(BaseEngine):
 
     def get_order(self, vt_orderid: str, use_df: bool = False) -> OrderData:
         """"""
-        return get_data(self.main_engine.get_order, arg=vt_orderid, use_df=use_df)
+        if not use_df:
+            return self.main_engine.get_order(vt_orderid)
+        return get_one(self.main_engine.get_order, arg=vt_orderid, use_df=True)
 
     def get_orders(self, vt_orderids: Sequence[str], use_df: bool = False) -> Sequence[OrderData]:
         """"""
-        orders = []
-        for vt_orderid in vt_orderids:
-            order = self.main_engine.get_order(vt_orderid)
-            orders.append(order)
+        get = self.main_engine.get_order
+        orders = [get(vt_orderid) for vt_orderid in vt_orderids]
 
         if not use_df:
             return orders
@@ -290,47 +583,70 @@ class CryptoEngineBase(BaseEngine):
 
     def get_trades(self, vt_orderid: str, use_df: bool = False) -> Sequence[TradeData]:
         """"""
-        trades = []
-        all_trades = self.main_engine.get_all_trades()
-
-        for trade in all_trades:
-            if trade.vt_orderid == vt_orderid:
-                trades.append(trade)
+        trades = list(self._order_trades.get(vt_orderid, {}).values())
 
         if not use_df:
             return trades
         else:
             return to_df(trades)
 
-    def get_all_active_orders(self, use_df: bool = True) -> Sequence[OrderData]:
+    def get_all_active_orders(self, use_df: bool = False) -> Sequence[OrderData]:
         """"""
-        return get_data(self.main_engine.get_all_active_orders, use_df=use_df)
+        return self._get_collection("active_orders", use_df)
+
+    def get_snapshot(self, use_df: bool = False) -> Snapshot:
+        """"""
+        return Snapshot(
+            accounts=self._get_collection("accounts", use_df),
+            positions=self._get_collection("positions", use_df),
+            active_orders=self._get_collection("active_orders", use_df)
+        )
 
     def get_contract(self, vt_symbol, use_df: bool = False) -> ContractData:
         """"""
-        return get_data(self.main_engine.get_contract, arg=vt_symbol, use_df=use_df)
+        if not use_df:
+            return self._contracts.get(vt_symbol) or self.main_engine.get_contract(vt_symbol)
+        return get_one(self.main_engine.get_contract, arg=vt_symbol, use_df=True)
 
-    def get_all_contracts(self, use_df: bool = True) -> Sequence[ContractData]:
+    def get_contracts(self, vt_symbols: Sequence[str]) -> dict:
+        """
+        Return {vt_symbol: ContractData} for the given symbols, missing ones are None.
+        """
+        get_contract = self.main_engine.get_contract
+        return {vt_symbol: get_contract(vt_symbol) for vt_symbol in vt_symbols}
+
+    def get_all_contracts(self, use_df: bool = False) -> Sequence[ContractData]:
         """"""
-        return get_data(self.main_engine.get_all_contracts, use_df=use_df)
+        return get_many(self.main_engine.get_all_contracts, use_df=use_df)
 
     def get_account(self, vt_accountid: str, use_df: bool = False) -> AccountData:
         """"""
-        return get_data(self.main_engine.get_account, arg=vt_accountid, use_df=use_df)
+        if not use_df:
+            return self._accounts.get(vt_accountid)
+        return get_one(self._accounts.get, arg=vt_accountid, use_df=True)
 
-    def get_all_accounts(self, use_df: bool = True) -> Sequence[AccountData]:
+    def get_all_accounts(self, use_df: bool = False) -> Sequence[AccountData]:
         """"""
-        return get_data(self.main_engine.get_all_accounts, use_df=use_df)
+        return self._get_collection("accounts", use_df)
 
     def get_position(self, vt_positionid: str, use_df: bool = False) -> PositionData:
         """"""
-        return get_data(self.main_engine.get_position, arg=vt_positionid, use_df=use_df)
+        if not use_df:
+            return self._positions.get(vt_positionid)
+        return get_one(self._positions.get, arg=vt_positionid, use_df=True)
 
-    def get_all_positions(self, use_df: bool = True) -> Sequence[PositionData]:
+    def get_symbol_positions(self, vt_symbol: str, use_df: bool = False) -> Sequence[PositionData]:
+        """
+        Positions of one symbol, without scanning all positions.
+        """
+        data = list(self._symbol_positions.get(vt_symbol, {}).values())
+        return to_df(data) if use_df else data
+
+    def get_all_positions(self, use_df: bool = False) -> Sequence[PositionData]:
         """"""
-        return get_data(self.main_engine.get_all_positions, use_df=use_df)
+        return self._get_collection("positions", use_df)
 
-    def get_bars(self, vt_symbol: str, start_date: str, interval: Interval, use_df: bool = True) -> Sequence[BarData]:
+    def get_bars(self, vt_symbol: str, start_date: str, interval: Interval, use_df: bool = False) -> Sequence[BarData]:
         """"""
         contract = self.main_engine.get_contract(vt_symbol)
         if not contract:
@@ -349,22 +665,68 @@ class CryptoEngineBase(BaseEngine):
 
         gateway = self.main_engine.gateways.get(contract.gateway_name)
         if gateway is not None:
-            return get_data(gateway.query_history, arg=req, use_df=use_df)
+            return get_many(gateway.query_history, arg=req, use_df=use_df)
 
-    def write_log(self, msg: str) -> None:
-        """"""
-        log = LogData(msg=msg, gateway_name=APP_NAME)
-        #print(f"{log.time}\t{log.msg}\t{get_debug_info()}")
-        print(f"{log.time}\t{log.msg}\t")
+    def write_log(self, msg: str, *args) -> None:
+        """
+        msg may be a %-format string, args are formatted on the log thread.
+        """
+        self._log_queue.put((time.time_ns(), msg, args))
 
-        event = Event(EVENT_CRYPTO_LOG, log)
-        self.event_engine.put(event)
+    def _drain_logs(self, batch_size: int = 100) -> None:
+        """
+        Print and publish queued log messages in batches until None is queued.
+        """
+        while True:
+            items = [self._log_queue.get()]
+            while len(items) < batch_size:
+                try:
+                    items.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in items:
+                if item is None:
+                    break
+                ts_ns, msg, args = item
+                if args:
+                    try:
+                        msg = msg % args
+                    except Exception:
+                        # a bad format string must not kill the log thread
+                        msg = f"{msg} {args!r}"
+                log = LogData(msg=msg, gateway_name=APP_NAME)
+                log.time = datetime.fromtimestamp(ts_ns / 1e9)
+                lines.append(f"{log.time}\t{log.msg}\t")
+                self.event_engine.put(Event(EVENT_CRYPTO_LOG, log))
+
+            if lines:
+                text = "\n".join(lines) + "\n"
+                # write bytes directly when stdout is a real stream (not in IPython)
+                out = getattr(sys.stdout, "buffer", None)
+                if out is not None:
+                    sys.stdout.flush()
+                    out.write(text.encode(sys.stdout.encoding or "utf-8", "replace"))
+                    out.flush()
+                else:
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+            if item is None:
+                return
 
     def send_email(self, msg: str) -> None:
         """"""
         subject = "脚本策略引擎通知"
         self.main_engine.send_email(subject, msg)
 
+    @classmethod
+    def _cleanup_all(cls):
+        for engine in list(cls._live_engines):
+            engine.cleanup()
+
     def cleanup(self):
         self.write_log("cleanup threads...")
         self.write_log("bye!")
+        self._log_queue.put(None)
+        self._log_thread.join(timeout=1)
@@ -11,7 +11,7 @@ import time
 import threading
 import signal
 from threading import Thread
-from functools import partial
+from functools import partial, lru_cache
 import atexit
 from dataclasses import dataclass, field
 
@@ -41,7 +41,7 @@ from vnpy_evo.trader.event import (
     EVENT_POSITION
 )
 from vn_qtrade.ai_trade.base import EVENT_AI_SIGNAL
-from .utils import get_data, to_df
+from .utils import get_data, to_df, kline_to_dataframe, load_json, save_json, extract_vt_symbol
 from vnpy_evo.trader.constant import (
     Direction,
     OrderType,
@@ -51,24 +51,99 @@ from vnpy_evo.trader.constant import (
     Status
 )
 
-from vnpy_evo.trader.utility import load_json, save_json, extract_vt_symbol, round_to
+from vnpy_evo.trader.utility import round_to
 from concurrent.futures import ThreadPoolExecutor
 from .base import CryptoEngineBase
 
 from copy import copy
 from tzlocal import get_localzone
 
-import inspect 
+import asyncio
+import socket
 
 
 import ccxt
+import ccxt.async_support
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 APP_NAME = "CryptoTrader"
 
 EVENT_CRYPTO_LOG = "eCryptoLog"
 
+# enum members bound once, compared by identity on the hot paths
+_DIR_LONG = Direction.LONG
+_DIR_SHORT = Direction.SHORT
+
+ORDER_SIDES = frozenset(('buy', 'sell'))
+# closing order side -> position side it closes
+POS_SIDE_FOR_SIDE = {'buy': 'short', 'sell': 'long'}
+
+# fixed part of the conditional (sl/tp) algo order payload
+_SLTP_BASE = {
+    'sl': {'tdMode': 'cross', 'ordType': 'conditional', 'slOrdPx': -1},
+    'tp': {'tdMode': 'cross', 'ordType': 'conditional', 'tpOrdPx': -1},
+}
+
+
+# fixed part of the trigger algo order payload, market order once triggered
+_TRIGGER_BASE = {'tdMode': 'cross', 'ordType': 'trigger', 'orderPx': -1}
+
+
+def _trigger_params(symbol: str, side: str, pos_side: str, trigger_price: float, sz) -> dict:
+    """OKX trigger algo order payload, market order once triggered."""
+    params = _TRIGGER_BASE.copy()
+    params['instId'] = symbol
+    params['side'] = side
+    params['posSide'] = pos_side
+    params['triggerPx'] = trigger_price
+    params['sz'] = sz
+    return params
+
+
+def _orjson_body(data, params=None) -> str:
+    """Drop-in for ccxt's Exchange.json, compact output like its json.dumps call"""
+    # numpy scalars (prices from DataFrames or the tick array) are written as plain numbers
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY, default=float).decode()
+
+
+@lru_cache(maxsize=256)
+def _volume_sz(volume: float) -> str:
+    """Order size string for a position volume, volumes repeat across position updates"""
+    return str(round(volume))
+
+
+@dataclass(slots=True)
+class TriggerTriggerOrder:
+    """Places a trigger order at trigPx2 once price crosses trigPx1"""
+    vt_symbol: str
+    side: str
+    trigPx1: float
+    trigPx2: float
+    volume: float
+    orderPx: float = -1
+
+
+def _tto_bounds(ttos: list) -> tuple:
+    """(highest buy trigPx1, lowest sell trigPx1), a tick strictly inside triggers nothing"""
+    buy_hi, sell_lo = float('-inf'), float('inf')
+    for tto in ttos:
+        if tto.side == 'buy':
+            buy_hi = max(buy_hi, tto.trigPx1)
+        elif tto.side == 'sell':
+            sell_lo = min(sell_lo, tto.trigPx1)
+    return buy_hi, sell_lo
 
-@dataclass
+
+@dataclass(slots=True)
 class TTOrder:
     vt_symbol: str
     direction: Direction
@@ -86,19 +161,43 @@ class OKXEngine(CryptoEngineBase):
         """"""
         super().__init__(main_engine, event_engine, APP_NAME)
         self.ccxt = None
+        # algo order REST calls go through the async client on this loop
+        self.ccxt_async = None
+        self._loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
         self.init_ccxt()
 
         self.sltp_cfg = {}  # should be {vt-symbol: config}
         self.default_sl = -0.35
         self.default_tp = 1.55
         self.trigger_trigger_orders = {} # tto
+        # ttos are added from the REPL/strategy and consumed on the event thread
+        self._tto_lock = threading.RLock()
+        # {vt_symbol: (buy_hi, sell_lo)}, lets the tick path reject without scanning
+        self.tto_bounds = {}
         self.tp_with_trigger = True # take profit using trigger orders
         self.max_tp = 1
 
         self.tp_trigger_orders = {}
         self.last_position = {}
+        # log market data latency for one tick in every N, 0 disables it
+        self.latency_sample_every = 100
+        self._tick_count = 0
+        # vt_positionid -> rounded volume the sl/tp trigger orders were last placed for
+        self._last_pos_key = {}
         self.offset = 0.1
         self.cancel_tp = True
+        self._sltp_template_cache = {}  # (vt_symbol, side, kind) -> params
+        self._trigger_template_cache = {}  # (vt_symbol, side, pos_side) -> params
+
+        # sl/tp checks issue REST calls, keep them off the event thread;
+        # a single worker keeps position updates in arrival order
+        self._position_pool = ThreadPoolExecutor(max_workers=1)
+        # vt_positionid -> latest PositionData not yet picked up by the worker,
+        # long and short legs of one symbol are queued separately
+        self._pending_positions = {}
+        self._pending_lock = threading.Lock()
 
         self.register_event()
 
@@ -123,6 +222,76 @@ class OKXEngine(CryptoEngineBase):
                     'https': f'http://{okx_gw.proxy_host}:{okx_gw.proxy_port}'
                 }
 
+            if self.ccxt_async is not None:
+                self.run_async(self.ccxt_async.close())
+            self.ccxt_async = ccxt.async_support.okx(
+                {
+                    'enableRateLimit': True,
+                    'apiKey': okx_gw.key,
+                    'secret': okx_gw.secret,
+                    'password': okx_gw.passphrase,
+                }
+            )
+            if okx_gw.proxy_host:
+                self.ccxt_async.aiohttp_proxy = f'http://{okx_gw.proxy_host}:{okx_gw.proxy_port}'
+            # implicit api methods used on the order paths, bound once per client
+            self._post_algo = self.ccxt_async.private_post_trade_order_algo
+            self._post_order = self.ccxt_async.private_post_trade_order
+            self._cancel_algos = self.ccxt_async.private_post_trade_cancel_algos
+            self._get_algos = self.ccxt_async.private_get_trade_orders_algo_pending
+            self._set_lev = self.ccxt_async.private_post_account_set_leverage
+            # ccxt serializes request bodies (and signs them) through Exchange.json
+            if orjson:
+                self.ccxt.json = _orjson_body
+                self.ccxt_async.json = _orjson_body
+            self.warmup_ccxt()
+
+    def warmup_ccxt(self):
+        """
+        Prime the TLS session of the async client in the background, so the
+        first order does not pay the handshake. The sync client only serves
+        interactive use and is left cold.
+        """
+        async def warmup_async():
+            try:
+                await self.ccxt_async.fetch_time()
+            except Exception as e:
+                self.write_log(f'ccxt async warmup error {e}')
+
+        asyncio.run_coroutine_threadsafe(warmup_async(), self._loop)
+
+    def enable_busy_poll(self, busy_poll_us: int = 50, gateway_name: str = 'OKX') -> int:
+        """
+        Set SO_BUSY_POLL (Linux only) on the gateway's open websocket sockets,
+        call again after a reconnect. Returns the number of sockets changed.
+        """
+        gateway = self.main_engine.gateways.get(gateway_name)
+        if gateway is None:
+            return 0
+
+        so_busy_poll = getattr(socket, 'SO_BUSY_POLL', 46)
+        count = 0
+        for api in vars(gateway).values():
+            ws = getattr(api, '_ws', None)
+            if ws is None:
+                continue
+            sock = ws.get_extra_info('socket')
+            if sock is None:
+                continue
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, so_busy_poll, busy_poll_us)
+                count += 1
+            except OSError as e:
+                self.write_log(f'set busy poll error {e}')
+        self.write_log(f'busy poll {busy_poll_us}us set on {count} sockets')
+        return count
+
+    def run_async(self, coro):
+        """
+        Run a coroutine on the engine loop and wait for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
     def register_event(self):
         self.event_engine.register(EVENT_TICK, self.process_tick_event)
         self.event_engine.register(EVENT_ORDER, self.process_order_event)
@@ -135,24 +304,25 @@ class OKXEngine(CryptoEngineBase):
         """"""
         tick = event.data
         self.last_tick[tick.vt_symbol] = tick
-        self.check_latency(tick)
+        self._tick_count += 1
+        if self.latency_sample_every and self._tick_count % self.latency_sample_every == 0:
+            self.check_latency(tick)
+        # no ttos set (the common case), skip the call entirely
+        if not self.tto_bounds:
+            return
         try:
             self.check_trigger_trigger_order(tick)
         except Exception as e:
-            self.write_log(f'tick error {e}')
+            self.write_log('tick error %s', e)
 
     def check_latency(self, tick: TickData):
         """
         Checks the latency between the tick timestamp and the current time.
         """
-        now = datetime.now(timezone.utc)
-
         # OKX sends UTC time, but the datetime object is naive. Attach timezone info.
-        aware_tick_datetime = tick.datetime.replace(tzinfo=timezone.utc)
-
-        latency = now - aware_tick_datetime
-        latency_ms = latency.total_seconds() * 1000
-        self.write_log(f"Market data latency for {tick.vt_symbol}: {latency_ms:.2f} ms")
+        tick_ts = tick.datetime.replace(tzinfo=timezone.utc).timestamp()
+        latency_ms = (time.time() - tick_ts) * 1000
+        self.write_log("Market data latency for %s: %.2f ms", tick.vt_symbol, latency_ms)
 
     def pause(self):
         if self._pause is False:
@@ -165,21 +335,38 @@ class OKXEngine(CryptoEngineBase):
     def process_order_event(self, event: Event):
         """"""
         order = event.data
-        self.write_log(f'received order event: {order}')
+        self.write_log('received order event: %s', order)
 
     def process_trade_event(self, event: Event):
         """"""
         trade = event.data
-        self.write_log(f'received trade event: {trade}')
+        self.write_log('received trade event: %s', trade)
 
     def process_position_event(self, event: Event):
-        """"""
+        """
+        Queue the position for the worker, a burst of updates for one position
+        that arrives before the worker gets to it is handled once, latest wins.
+        """
         position = event.data
+        vt_positionid = position.vt_positionid
+        with self._pending_lock:
+            queued = vt_positionid in self._pending_positions
+            self._pending_positions[vt_positionid] = position
+        if not queued:
+            self._position_pool.submit(self._process_pending_position, vt_positionid)
+
+    def _process_pending_position(self, vt_positionid: str):
+        with self._pending_lock:
+            position = self._pending_positions.pop(vt_positionid)
+        self.process_position(position)
+
+    def process_position(self, position: PositionData):
+        """"""
         try:
             if self._pause is False:
                 self.check_sl_tp(position)
         except Exception as e:
-            self.write_log(f'position error {e}')
+            self.write_log('position error %s', e)
         self.last_position[position.vt_symbol] = position
 
     def process_ai_signal_event(self, event: Event):
@@ -192,8 +379,8 @@ class OKXEngine(CryptoEngineBase):
         signal = event.data
 
         try:
-            self.write_log(f"Received AI Signal: {signal.vt_symbol} {signal.direction.value} {signal.volume} @ {signal.price}")
-            self.write_log(f"AI Rationale: {signal.rationale}")
+            self.write_log("Received AI Signal: %s %s %s @ %s", signal.vt_symbol, signal.direction.value, signal.volume, signal.price)
+            self.write_log("AI Rationale: %s", signal.rationale)
 
             # Execute the trade based on signal
             if signal.direction == Direction.LONG:
@@ -220,82 +407,110 @@ class OKXEngine(CryptoEngineBase):
             'lever': lever
         }
         try:
-            data = self.ccxt.private_post_account_set_leverage(params=params)
+            data = self.run_async(self._set_lev(params=params))
             return data
         except Exception as e:
             self.write_log(f'set level error {e}')
 
 
+    def _sltp_config(self, vt_symbol) -> dict:
+        """sl/tp config of the symbol, created with the defaults if missing"""
+        config = self.sltp_cfg.get(vt_symbol)
+        if config is None:
+            config = self.sltp_cfg[vt_symbol] = {'stoploss': self.default_sl, 'takeprofit': self.default_tp}
+        return config
+
     def set_sl(self, vt_symbol, sl):
-        self.sltp_cfg[vt_symbol]['stoploss'] = sl
-        self.set_trigger_cover_positions(vt_symbol=vt_symbol)
+        self._sltp_config(vt_symbol)['stoploss'] = sl
+        self._reset_trigger_cover(vt_symbol=vt_symbol)
 
     def set_all_sl(self, sl):
-        for (k, v) in self.sltp_cfg.items():
-            self.sltp_cfg[k]['stoploss'] = sl
-        self.set_trigger_cover_positions()
+        for config in self.sltp_cfg.values():
+            config['stoploss'] = sl
+        self._reset_trigger_cover()
 
     def set_tp(self, vt_symbol, tp):
-        self.sltp_cfg[vt_symbol]['takeprofit'] = tp
-        self.set_trigger_cover_positions(vt_symbol=vt_symbol)
+        self._sltp_config(vt_symbol)['takeprofit'] = tp
+        self._reset_trigger_cover(vt_symbol=vt_symbol)
 
     def set_all_tp(self, tp):
-        for (k, v) in self.sltp_cfg.items():
-            self.sltp_cfg[k]['takeprofit'] = tp
-        self.set_trigger_cover_positions()
+        for config in self.sltp_cfg.values():
+            config['takeprofit'] = tp
+        self._reset_trigger_cover()
+
+    def _reset_trigger_cover(self, vt_symbol=None):
+        """
+        Re-place cover trigger orders in the background, serialized with position processing.
+        """
+        self._position_pool.submit(self._run_logged, self.set_trigger_cover_positions, vt_symbol=vt_symbol)
+
+    def _run_logged(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self.write_log(f'{func.__name__} error {e}')
+
+    def get_sltp_params(self, vt_symbol: str, side: str, kind: str) -> dict:
+        """
+        Return a fresh copy of the cached sl/tp payload for the symbol and side.
+        """
+        key = (vt_symbol, side, kind)
+        template = self._sltp_template_cache.get(key)
+        if template is None:
+            assert side in ORDER_SIDES
+            symbol, exchange_name = extract_vt_symbol(vt_symbol)
+            template = {**_SLTP_BASE[kind], 'instId': symbol, 'side': side}
+            self._sltp_template_cache[key] = template
+        return template.copy()
+
+    def get_trigger_params(self, vt_symbol: str, side: str, pos_side: str) -> dict:
+        """
+        Return a fresh copy of the cached trigger payload, triggerPx and sz to be filled.
+        """
+        key = (vt_symbol, side, pos_side)
+        template = self._trigger_template_cache.get(key)
+        if template is None:
+            assert side in ORDER_SIDES
+            symbol, exchange_name = extract_vt_symbol(vt_symbol)
+            template = _trigger_params(symbol, side, pos_side, None, None)
+            self._trigger_template_cache[key] = template
+        return template.copy()
 
     def trigger_sl(self, vt_symbol: str, side:str, price: float, volume: float) -> str:
-        symbol, exchange_name = extract_vt_symbol(vt_symbol)
-        assert side in ['buy', 'sell']
-        params = {
-            'instId': symbol,
-            'tdMode': 'cross',
-            'side': side,
-            'ordType': 'conditional',
-            'slTriggerPx': price,
-            'sz': volume,
-            'slOrdPx': -1
-        }
+        params = self.get_sltp_params(vt_symbol, side, 'sl')
+        params['slTriggerPx'] = price
+        params['sz'] = volume
         try:
-            data = self.ccxt.private_post_trade_order_algo(params=params)
+            data = self.run_async(self._post_algo(params=params))
             return data
         except Exception as e:
             self.write_log(f'trigger sl error {e}')
 
     def trigger_tp(self, vt_symbol: str, side:str, price: float, volume: float) -> str:
-        symbol, exchange_name = extract_vt_symbol(vt_symbol)
-        assert side in ['buy', 'sell']
-        params = {
-            'instId': symbol,
-            'tdMode': 'cross',
-            'side': side,
-            'ordType': 'conditional',
-            'tpTriggerPx': price,
-            'sz': volume,
-            'tpOrdPx': -1
-        }
+        params = self.get_sltp_params(vt_symbol, side, 'tp')
+        params['tpTriggerPx'] = price
+        params['sz'] = volume
         try:
-            data = self.ccxt.private_post_trade_order_algo(params=params)
+            data = self.run_async(self._post_algo(params=params))
             return data
         except Exception as e:
             self.write_log(f'trigger tp error {e}')
 
     def cover_position(self, position: PositionData, trigger:bool=False):
         symbol, exchange_name = extract_vt_symbol(position.vt_symbol)
-        side = 'sell' if position.direction == Direction.LONG else 'buy'
-        sz = str(round(position.volume))
+        side = 'sell' if position.direction is _DIR_LONG else 'buy'
+        sz = _volume_sz(position.volume)
 
         params = {
             'instId': symbol,
             'tdMode': 'cross',
             'side': side,
-            'posSide': 'short' if side=='buy' else 'long',
+            'posSide': POS_SIDE_FOR_SIDE[side],
             'ordType': 'market',
             'sz': sz
         }
         try:
-            data = self.ccxt.private_post_trade_order(params=params)
-            #data= self.ccxt.create_order(symbol, 'market', side, sz)
+            data = self.run_async(self._post_order(params=params))
             if data['code'] == "0":
                 return data
         except Exception as e:
@@ -305,141 +520,118 @@ class OKXEngine(CryptoEngineBase):
         return self.set_trigger_cover_positions(cancel_all=False, offset=offset, use_tick_price=True, vt_symbol=vt_symbol)
 
     def set_trigger_cover_positions(self, cancel_all=True, offset=0.0, use_tick_price=False, use_max_tp=False, vt_symbol=None):
-        positions = self.get_all_positions(use_df=False)
+        assert not (use_tick_price and use_max_tp), "use_tick_price and use_max_tp should not both set"
+        if vt_symbol is not None:
+            positions = self.get_symbol_positions(vt_symbol)
+        else:
+            positions = self.get_all_positions(use_df=False)
+        # (kind, params, coroutine), sent together after all cancels
+        orders = []
+        # engine settings read once for the whole loop
+        engine_offset = self.offset
+        max_tp = self.max_tp
         for position in positions:
-            if vt_symbol is not None and position.vt_symbol!=vt_symbol: continue
+            vs = position.vt_symbol
+            if vt_symbol is not None and vs != vt_symbol: continue
+            is_short = position.direction is _DIR_SHORT
             if cancel_all:
-                side = 'short' if position.direction == Direction.SHORT else 'long'
-                self.cancel_all_trigger_orders(position.vt_symbol, side=side)
+                self.cancel_all_trigger_orders(vs, side='short' if is_short else 'long')
             if position.volume == 0: continue
-            symbol, exchange_name = extract_vt_symbol(position.vt_symbol)
-            side = 'sell' if position.direction == Direction.LONG else 'buy'
-            sz = str(round(position.volume))
-            if self.sltp_cfg.get(position.vt_symbol) is None:
+            symbol, exchange_name = extract_vt_symbol(vs)
+            side = 'sell' if position.direction is _DIR_LONG else 'buy'
+            pos_side = POS_SIDE_FOR_SIDE[side]
+            sz = _volume_sz(position.volume)
+            cfg = self.sltp_cfg.get(vs)
+            if cfg is None:
                 sl = self.default_sl
                 tp = self.default_tp
-                # add subscribe for new symbol
-                self.subscribe([position.vt_symbol])
-                self.sltp_cfg[position.vt_symbol] = {}
-                self.sltp_cfg[position.vt_symbol]['stoploss'] = sl
-                self.sltp_cfg[position.vt_symbol]['takeprofit'] = tp
+                # add subscribe for new symbol, subscribe() skips it if already subscribed
+                self.subscribe([vs])
+                self.sltp_cfg[vs] = {'stoploss': sl, 'takeprofit': tp}
             else:
-                sl = self.sltp_cfg.get(position.vt_symbol).get('stoploss')
-                tp = self.sltp_cfg.get(position.vt_symbol).get('takeprofit')
-
-            assert not (use_tick_price and use_max_tp), "use_tick_price and use_max_tp should not both set"
+                sl = cfg.get('stoploss')
+                tp = cfg.get('takeprofit')
 
+            pprice = position.price
+            lever = position.lever
             liqPrice = position.liqPrice
             # stop loss
             if sl is not None:
-                if position.direction == Direction.SHORT:
+                if use_tick_price:
+                    last_price = self.last_tick[vs].last_price
+                if is_short:
                     if use_tick_price:
-                        trigger_price = self.last_tick[position.vt_symbol].last_price * (1 + offset / position.lever)
+                        trigger_price = last_price * (1 + offset / lever)
                         if trigger_price >= liqPrice:
-                            trigger_price = liqPrice * (1 - self.offset / position.lever)
+                            trigger_price = liqPrice * (1 - engine_offset / lever)
                     else:
-                        trigger_price = position.price * (1 - (sl - offset) / position.lever)
+                        trigger_price = pprice * (1 - (sl - offset) / lever)
                         if trigger_price >= liqPrice:
-                            trigger_price = liqPrice * (1 - self.offset / position.lever)
+                            trigger_price = liqPrice * (1 - engine_offset / lever)
                         if use_max_tp:
-                            if position.pnlRatio > self.max_tp:
-                                trigger_price = position.price * (1 + (self.max_tp - self.offset) / position.lever)
+                            if position.pnlRatio > max_tp:
+                                trigger_price = pprice * (1 + (max_tp - engine_offset) / lever)
                 else:
                     if use_tick_price:
-                        trigger_price = self.last_tick[position.vt_symbol].last_price * (1 - offset / position.lever)
+                        trigger_price = last_price * (1 - offset / lever)
                         if trigger_price <= liqPrice:
-                            trigger_price = liqPrice * (1 + self.offset / position.lever)
+                            trigger_price = liqPrice * (1 + engine_offset / lever)
                     else:
-                        trigger_price = position.price * (1 + (sl + offset) / position.lever)
+                        trigger_price = pprice * (1 + (sl + offset) / lever)
                         if trigger_price <= liqPrice:
-                            trigger_price = liqPrice * (1 + self.offset / position.lever)
+                            trigger_price = liqPrice * (1 + engine_offset / lever)
                         if use_max_tp:
-                            if position.pnlRatio > self.max_tp:
-                                trigger_price = position.price * (1 - (self.max_tp + self.offset) / position.lever)
-
-                symbol, exchange = extract_vt_symbol(position.vt_symbol)
-                params = {
-                    'instId': symbol,
-                    'tdMode': 'cross',
-                    'side': side,
-                    'posSide': 'short' if side=='buy' else 'long',
-                    'ordType': 'trigger',
-                    'triggerPx': trigger_price,
-                    'sz': sz,
-                    'orderPx': -1
-                }
-                data = self.send_trigger_order(position.vt_symbol,
-                                               side,
-                                               'short' if side=='buy' else 'long',
-                                               trigger_price,
-                                               sz
-                )
-                if data['code'] == "0":
-                    self.write_log(f'place sl trigger order {params}')
-                else:
-                    self.write_log(f'place sl trigger order error {data}')
+                            if position.pnlRatio > max_tp:
+                                trigger_price = pprice * (1 - (max_tp + engine_offset) / lever)
+
+                params = _trigger_params(symbol, side, pos_side, trigger_price, sz)
+                orders.append((
+                    'sl',
+                    params,
+                    self._post_algo(params=params)
+                ))
             # take profit
             if tp is not None and not self.tp_with_trigger:
-                if position.direction == Direction.SHORT:
-                    trigger_price = position.price * (1 - (tp - offset) / position.lever)
+                if is_short:
+                    trigger_price = pprice * (1 - (tp - offset) / lever)
                 else:
-                    trigger_price = position.price * (1 + (tp + offset) / position.lever)
-                if position.volume>0:
-                    params = {
-                        'instId': symbol,
-                        'tdMode': 'cross',
-                        'side': side,
-                        'posSide': 'short' if side=='buy' else 'long',
-                        'ordType': 'trigger',
-                        'triggerPx': trigger_price,
-                        'sz': sz,
-                        'orderPx': -1
-                    }
-                data = self.send_trigger_order(position.vt_symbol,
-                                               side,
-                                               'short' if side=='buy' else 'long',
-                                               trigger_price,
-                                               sz
-                )
-                if data['code'] == "0":
-                    self.write_log(f'place tp trigger order {params}')
-                else:
-                    self.write_log(f'error place tp trigger order {params}')
+                    trigger_price = pprice * (1 + (tp + offset) / lever)
+                params = _trigger_params(symbol, side, pos_side, trigger_price, sz)
+                orders.append((
+                    'tp',
+                    params,
+                    self._post_algo(params=params)
+                ))
+
+        if not orders:
+            return
+        results = self.run_async(self._gather([coro for _, _, coro in orders]))
+        for (kind, params, _), data in zip(orders, results):
+            if isinstance(data, Exception):
+                self.write_log(f'send trigger order error {data}')
+            elif data['code'] == "0":
+                self.write_log('place %s trigger order %s', kind, params)
+            else:
+                self.write_log(f'place {kind} trigger order error {data} {params}')
+
+    async def _gather(self, coros: list):
+        """
+        Await coroutines concurrently on the engine loop, exceptions are returned as results.
+        """
+        return await asyncio.gather(*coros, return_exceptions=True)
 
     def send_trigger_order(self, vt_symbol: str, side:str, posSide:str, price: float, volume: float) -> str:
-        symbol, exchange_name = extract_vt_symbol(vt_symbol)
-        assert side in ['buy', 'sell']
-        if side == 'buy':
-            params = {
-                'instId': symbol,
-                'tdMode': 'cross',
-                'side': side,
-                'posSide': posSide,
-                'ordType': 'trigger',
-                'triggerPx': price,
-                'sz': volume,
-                'orderPx': -1
-            }
-        else:
-            params = {
-                'instId': symbol,
-                'tdMode': 'cross',
-                'side': side,
-                'posSide': posSide,
-                'ordType': 'trigger',
-                'triggerPx': price,
-                'sz': volume,
-                'orderPx': -1
-            }
         try:
-            data = self.ccxt.private_post_trade_order_algo(params=params)
-            if data['code'] == "0":
-                return data
-            else:
-                return data
+            return self.run_async(self._send_trigger_order_async(vt_symbol, side, posSide, price, volume))
         except Exception as e:
             self.write_log(f'send trigger order error {e}')
 
+    async def _send_trigger_order_async(self, vt_symbol: str, side:str, posSide:str, price: float, volume: float):
+        params = self.get_trigger_params(vt_symbol, side, posSide)
+        params['triggerPx'] = price
+        params['sz'] = volume
+        return await self._post_algo(params=params)
+
     def get_trigger_orders(self, vt_symbol:str=None, instType:str='SWAP', ordType:str='trigger'):
         """
         请求示例
@@ -476,7 +668,7 @@ class OKXEngine(CryptoEngineBase):
                 'ordType': ordType
             }
         try:
-            data = self.ccxt.private_get_trade_orders_algo_pending(params=params)
+            data = self.run_async(self._get_algos(params=params))
             return data
         except Exception as e:
             self.write_log(f'get trigger orders error {e}')
@@ -484,31 +676,57 @@ class OKXEngine(CryptoEngineBase):
     def cancel_trigger_orders(self, ordIds:list):
         param = ordIds
         try:
-            data = self.ccxt.private_post_trade_cancel_algos(params=param)
+            data = self.run_async(self._cancel_algos(params=param))
             return data
         except Exception as e:
             self.write_log(f'cancel trigger order error {e}')
 
     def cancel_all_trigger_orders(self, symbol:str=None, side:str='all'):
-        tg_orders = self.get_trigger_orders(symbol)
-        orders = []
-        if tg_orders is None or len(tg_orders['data'])==0:
+        try:
+            results = self.run_async(self._cancel_all_trigger_orders_async(symbol, side))
+        except Exception as e:
+            self.write_log(f'cancel trigger order error {e}')
             return
-        for od in tg_orders['data']:
-            if side == 'all':
-                orders.append({'algoId': od['algoId'], 'instId': od['instId']})
-            elif side == 'long':
-                if od['posSide'] == 'long':
-                    orders.append({'algoId': od['algoId'], 'instId': od['instId']})
-            elif side == 'short':
-                if od['posSide'] == 'short':
-                    orders.append({'algoId': od['algoId'], 'instId': od['instId']})
-
-        for i in range(0, len(orders), 10):
-            od_list = orders[i:i+10]
-            data = self.cancel_trigger_orders(od_list)
-            time.sleep(0.1)
-            self.write_log(f'cancel trigger orders {data}')
+        for data in results:
+            if isinstance(data, Exception):
+                self.write_log(f'cancel trigger order error {data}')
+            else:
+                self.write_log(f'cancel trigger orders {data}')
+
+    async def _cancel_all_trigger_orders_async(self, symbol:str=None, side:str='all') -> list:
+        """
+        List pending trigger orders and cancel those on the given pos side, all on the engine loop.
+        """
+        params = {'ordType': 'trigger'}
+        if symbol is not None:
+            params['instId'] = extract_vt_symbol(symbol)[0]
+        tg_orders = await self._get_algos(params=params)
+        orders = [
+            {'algoId': od['algoId'], 'instId': od['instId']}
+            for od in (tg_orders or {}).get('data') or ()
+            if side == 'all' or od['posSide'] == side
+        ]
+        # okx cancels at most 10 algo orders per request, send the batches concurrently
+        return await self._gather(
+            [self._cancel_algos(params=orders[i:i+10])
+             for i in range(0, len(orders), 10)]
+        )
+
+    async def _replace_trigger_order_async(self, vt_symbol: str, pos_side: str, params: dict):
+        """
+        Cancel the pos side trigger orders then place the new one, in a single trip to the loop.
+        """
+        try:
+            results = await self._cancel_all_trigger_orders_async(vt_symbol, pos_side)
+        except Exception as e:
+            # still place the new order, as when the cancel went through its own call
+            results = [e]
+        for data in results:
+            if isinstance(data, Exception):
+                self.write_log(f'cancel trigger order error {data}')
+            else:
+                self.write_log('cancel trigger orders %s', data)
+        return await self._post_algo(params=params)
 
     def check_stop_order(self, tick: TickData):
         """"""
@@ -517,10 +735,10 @@ class OKXEngine(CryptoEngineBase):
                 continue
 
             long_triggered = (
-                stop_order.direction == Direction.LONG and tick.last_price >= stop_order.price
+                stop_order.direction is _DIR_LONG and tick.last_price >= stop_order.price
             )
             short_triggered = (
-                stop_order.direction == Direction.SHORT and tick.last_price <= stop_order.price
+                stop_order.direction is _DIR_SHORT and tick.last_price <= stop_order.price
             )
 
             if long_triggered or short_triggered:
@@ -529,7 +747,7 @@ class OKXEngine(CryptoEngineBase):
                 # To get excuted immediately after stop order is
                 # triggered, use limit price if available, otherwise
                 # use ask_price_5 or bid_price_5
-                if stop_order.direction == Direction.LONG:
+                if stop_order.direction is _DIR_LONG:
                     if tick.limit_up:
                         price = tick.limit_up
                     else:
@@ -577,23 +795,29 @@ class OKXEngine(CryptoEngineBase):
         """
         Trigger a trigger order when price could rapidly reverse
         """
-        tto_data = {
-            "vt_symbol": vt_symbol,
-            "side": side,
-            "trigPx1": trigPx1,
-            "trigPx2": trigPx2,
-            "volume": volume,
-            "orderPx": orderPx
-        }
+        tto_data = TriggerTriggerOrder(vt_symbol, side, trigPx1, trigPx2, volume, orderPx)
         if side == 'buy'    and trigPx1 > self.last_tick[vt_symbol].last_price:
             self.write_log(f'trigPx1 {trigPx1} should < {self.last_tick[vt_symbol].last_price}')
             return
         elif side == 'sell' and trigPx1 < self.last_tick[vt_symbol].last_price:
             self.write_log(f'trigPx1 {trigPx1} should > {self.last_tick[vt_symbol].last_price}')
             return
-        if self.trigger_trigger_orders.get(vt_symbol) is None or clean_others:
-            self.trigger_trigger_orders[vt_symbol] = []
-        self.trigger_trigger_orders[vt_symbol].append(tto_data)
+        self._add_tto(tto_data, clean_others=clean_others)
+
+    def _add_tto(self, tto: TriggerTriggerOrder, clean_others: bool = False):
+        vt_symbol = tto.vt_symbol
+        with self._tto_lock:
+            if self.trigger_trigger_orders.get(vt_symbol) is None or clean_others:
+                self.trigger_trigger_orders[vt_symbol] = []
+                self.tto_bounds.pop(vt_symbol, None)
+            self.trigger_trigger_orders[vt_symbol].append(tto)
+            # widen the band by the new tto only, no rescan of the list
+            buy_hi, sell_lo = self.tto_bounds.get(vt_symbol, (float('-inf'), float('inf')))
+            if tto.side == 'buy':
+                buy_hi = max(buy_hi, tto.trigPx1)
+            elif tto.side == 'sell':
+                sell_lo = min(sell_lo, tto.trigPx1)
+            self.tto_bounds[vt_symbol] = (buy_hi, sell_lo)
 
     def tto(self, vt_symbol: str, side:str,
                                   trigPx1: float, trigPx2: float, volume: float, orderPx: float=-1,
@@ -615,47 +839,68 @@ class OKXEngine(CryptoEngineBase):
         """
         Check if current tick is cross the preset price
         """
-        # self.write_log(f'check tick {tick}')
-        for (vt_symbol, ttos) in self.trigger_trigger_orders.items():
-            if tick.vt_symbol != vt_symbol:
-                continue
-            for i in range(0, len(ttos)):
-                tto = ttos[i]
-                if tto['side'] == 'buy':
-                    if tick.last_price < tto['trigPx1']:
-                        self.write_log(f'triggered {tto}')
-                        data = self.send_trigger_order(
-                            vt_symbol,
-                            tto['side'],
-                            'long',
-                            tto['trigPx2'],
-                            tto['volume']
-                        )
-                        if data['code'] == '0':
-                            ttos.pop(i)
-                            self.write_log(f'{tto} trigger order sent')
-                        else:
-                            self.write_log(f'tto error {data}')
-                elif tto['side'] == 'sell':
-                    if tick.last_price > tto['trigPx1']:
-                        self.write_log(f'triggered {tto}')
-                        data = self.send_trigger_order(
-                            vt_symbol,
-                            tto['side'],
-                            'short',
-                            tto['trigPx2'],
-                            tto['volume']
-                        )
-                        if data['code'] == '0':
-                            ttos.pop(i)
-                            self.write_log(f'{tto} trigger order sent')
-                        else:
-                            self.write_log(f'tto error {data}')
+        vt_symbol = tick.vt_symbol
+        # most ticks have no tto for their symbol or sit between the trigger
+        # prices, skip the lock and the scan for them
+        bounds = self.tto_bounds.get(vt_symbol)
+        if bounds is None or bounds[0] <= tick.last_price <= bounds[1]:
+            return
+
+        with self._tto_lock:
+            ttos = self.trigger_trigger_orders.get(vt_symbol)
+            if not ttos:
+                return
+
+            remaining = []
+            fired = []
+            for tto in ttos:
+                if tto.side == 'buy':
+                    triggered, pos_side = tick.last_price < tto.trigPx1, 'long'
+                elif tto.side == 'sell':
+                    triggered, pos_side = tick.last_price > tto.trigPx1, 'short'
                 else:
                     self.write_log('not valid')
+                    remaining.append(tto)
+                    continue
+
+                if not triggered:
+                    remaining.append(tto)
+                    continue
+
+                self.write_log('triggered %s', tto)
+                fired.append((tto, pos_side))
+
+            if fired:
+                ttos[:] = remaining
+                if remaining:
+                    self.tto_bounds[vt_symbol] = _tto_bounds(remaining)
+                else:
+                    self.tto_bounds.pop(vt_symbol, None)
+
+        # place the orders on the engine loop, the event thread does not wait on REST
+        for tto, pos_side in fired:
+            asyncio.run_coroutine_threadsafe(self._fire_tto_async(tto, pos_side), self._loop)
+
+    async def _fire_tto_async(self, tto: TriggerTriggerOrder, pos_side: str):
+        """
+        Send the trigger order of a fired tto, put the tto back if it failed.
+        """
+        try:
+            data = await self._send_trigger_order_async(
+                tto.vt_symbol, tto.side, pos_side, tto.trigPx2, tto.volume
+            )
+        except Exception as e:
+            data = e
+        if isinstance(data, dict) and data.get('code') == '0':
+            self.write_log('%s trigger order sent', tto)
+        else:
+            self.write_log(f'tto error {data}')
+            self._add_tto(tto)
 
     def cleanup_ttos(self):
-        self.trigger_trigger_orders = {}
+        with self._tto_lock:
+            self.trigger_trigger_orders = {}
+            self.tto_bounds = {}
 
     def adjust_tp(self, vt_symbol: str=None, mul: float = 1.5):
         """
@@ -664,124 +909,78 @@ class OKXEngine(CryptoEngineBase):
         assert mul > 0, "mul should not be negetive"
         # change it for single symbol
         if vt_symbol:
-            if self.sltp_cfg.get(vt_symbol) is None: return
-            self.sltp_cfg[vt_symbol]['takeprofit'] = abs(self.sltp_cfg[vt_symbol]['stoploss']) * mul
+            config = self.sltp_cfg.get(vt_symbol)
+            if config is None: return
+            config['takeprofit'] = abs(config['stoploss']) * mul
         # change for all symbols
         else:
-            for (vt_symbol, config) in self.sltp_cfg.items():
-                config['takeprofit'] = config['stoploss'] * mul
+            for config in self.sltp_cfg.values():
+                config['takeprofit'] = abs(config['stoploss']) * mul
         # done
 
     def check_sl_tp(self, position: PositionData):
-        #self.write_log("sltp")
         # create sl tp trigger orders first
-        last_position = self.last_position.get(position.vt_symbol)
-        if last_position is None:
-            self.set_trigger_cover_positions(vt_symbol=position.vt_symbol)
-        elif position.volume != last_position.volume:
+        # float noise in volume must not re-place the orders
+        # keyed per leg, long and short updates of one symbol must not look like changes
+        volume = round(position.volume, 6)
+        if self._last_pos_key.get(position.vt_positionid) != volume:
+            self._last_pos_key[position.vt_positionid] = volume
             self.set_trigger_cover_positions(vt_symbol=position.vt_symbol)
         # check if volume valid
-        if not position.volume > 0: return False
-        for (vt_symbol, sltp_cfg) in self.sltp_cfg.items():
-            if vt_symbol != position.vt_symbol:
-                continue
-            elif position.volume == 0:
-                continue
+        if position.volume <= 0: return False
+        vt_symbol = position.vt_symbol
+        sltp_cfg = self.sltp_cfg.get(vt_symbol)
+        if sltp_cfg is not None:
             sl = sltp_cfg.get('stoploss')
             tp = sltp_cfg.get('takeprofit')
-            if sl and position.pnlRatio < sl:
+            pnl_ratio = position.pnlRatio
+            if sl and pnl_ratio < sl:
                 self.write_log('trigger stoploss')
                 self.cover_position(position)
-            if tp and position.pnlRatio > tp:
+            if tp and pnl_ratio > tp:
                 if self.tp_with_trigger is True:
-                    # self.set_trigger_cover_positions(cancel_all=True, use_max_tp=True, vt_symbol=position.vt_symbol)
-                    if position.direction == Direction.LONG:
-                        trigger_price = self.last_tick[vt_symbol].last_price * (1 - self.offset / position.lever)
-                        if position.pnlRatio > self.max_tp:
-                            trigger_price = position.price * (1 + (self.max_tp - self.offset) / position.lever)
+                    is_long = position.direction is _DIR_LONG
+                    # +1 long / -1 short: trail offset behind last price, or lock max_tp from entry
+                    sign = 1.0 if is_long else -1.0
+                    lever = position.lever
+                    offset = self.offset
+                    max_tp = self.max_tp
+                    if pnl_ratio > max_tp:
+                        trigger_price = position.price * (1 + (sign * max_tp - offset) / lever)
                     else:
-                        trigger_price = self.last_tick[vt_symbol].last_price * (1 + self.offset / position.lever)
-                        if position.pnlRatio > self.max_tp:
-                            trigger_price = position.price * (1 - (self.max_tp + self.offset) / position.lever)
-
-                    symbol, exchange_name = extract_vt_symbol(position.vt_symbol)
-                    side = 'sell' if position.direction == Direction.LONG else 'buy'
-                    sz = str(round(position.volume))
-                    params = {
-                        'instId': symbol,
-                        'tdMode': 'cross',
-                        'side': side,
-                        'posSide': 'short' if side=='buy' else 'long',
-                        'ordType': 'trigger',
-                        'triggerPx': trigger_price,
-                        'sz': sz,
-                        'orderPx': -1
-                    }
-                    #if self.last_tick[vt_symbol].last_price - position.price
+                        trigger_price = self.last_tick[vt_symbol].last_price * (1 - sign * offset / lever)
+
+                    side = 'sell' if is_long else 'buy'
+                    pos_side = POS_SIDE_FOR_SIDE[side]
+                    params = self.get_trigger_params(vt_symbol, side, pos_side)
+                    params['triggerPx'] = trigger_price
+                    params['sz'] = _volume_sz(position.volume)
                     if self.cancel_tp:
-                        self.cancel_all_trigger_orders(position.vt_symbol,
-                                                       side='short' if side=='buy' else 'long')
-                    data = self.send_trigger_order(position.vt_symbol,
-                                                   side,
-                                                   'short' if side=='buy' else 'long',
-                                                   trigger_price,
-                                                   sz
-                    )
-                    if data['code'] == "0":
-                        self.write_log(f'place tp trigger order {params}')
+                        coro = self._replace_trigger_order_async(vt_symbol, pos_side, params)
+                    else:
+                        coro = self._post_algo(params=params)
+                    try:
+                        data = self.run_async(coro)
+                    except Exception as e:
+                        data = None
+                        self.write_log(f'send trigger order error {e}')
+                    if data and data['code'] == "0":
+                        self.write_log('place tp trigger order %s', params)
                 else:
                     self.write_log('trigger takeprofit')
                     self.cover_position(position)
 
+    def cleanup(self):
+        self._position_pool.shutdown(wait=False, cancel_futures=True)
+        if self.ccxt_async is not None:
+            self.run_async(self.ccxt_async.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        super().cleanup()
+
     def get_kline(self, vt_symbol, frequency:str="1h", as_df:bool=True):
         symbol, exchange = extract_vt_symbol(vt_symbol)
-        kline = self.ccxt.fetch_ohlcv(symbol, frequency)
-        df = pd.DataFrame(kline, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
-        df['datetime'] = pd.to_datetime(df['ts'], unit='ms')
-        df.index = df['datetime']
-        del df['datetime']
-        return df
-"""
-    def set_trigger_zone(self, vt_symbol, price, volume, offset:float=None):
-        # set a trigger zone if price enters this zone, and left out with tto triggered
-        if offset is None: offset = self.offset
-        last_price = self.last_tick[vt_symbol].last_price
-        trend_dir = 'up' if price > last_price else 'down'
-        if trend_dir == 'down':
-            self.engine.tto(vt_symbol,
-                       'sell',
-                       trend_val,
-                       trend_val * (1 - offset),
-                       size,
-                       clean_others=True)
-            data = self.engine.send_trigger_order(
-                vt_symbol,
-                'buy',
-                'long',
-                trend_val * (1 + offset * 1.5),
-                size
-            )
-            if data['code'] == '0':
-                engine.write_log(f'{vt_symbol} {freq} {trend_dir} trigger order sent')
-            else:
-                engine.write_log(f'error {data}')
-        elif trend_dir == 'up':
-            engine.tto(vt_symbol,
-                       'buy',
-                       trend_val,
-                       trend_val * (1 + offset),
-                       size,
-                       clean_others=True)
-            data = engine.send_trigger_order(
-                vt_symbol,
-                'sell',
-                'short',
-                trend_val * (1 - offset * 1.5),
-                size
-            )
-            if data['code'] == '0':
-                engine.write_log(f'{vt_symbol} {freq} {trend_dir} trigger order sent')
-            else:
-                engine.write_log(f'error {data}')   
-"""
+        kline = self.run_async(self.ccxt_async.fetch_ohlcv(symbol, frequency))
+        if not as_df:
+            return kline
+        return kline_to_dataframe(kline)
 
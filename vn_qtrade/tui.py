@@ -5,13 +5,59 @@ This file defines the Text-based User Interface (TUI) for the vn_qtrade applicat
 It uses the 'textual' library to create a rich, interactive terminal interface for trading.
 """
 
-from datetime import datetime, timezone
+import time
+from collections import deque
+from functools import lru_cache
 from typing import List
 
+# Panels buffer engine updates and redraw at most once per interval (seconds)
+FLUSH_INTERVAL = 0.05
+# Trades kept between two flushes, older ones of a burst are dropped
+MAX_PENDING_TRADES = 200
+# Log lines are written in chunks at this interval (seconds)
+LOG_FLUSH_INTERVAL = 0.1
+MAX_PENDING_LOG_LINES = 5000
+
+# (label, column key) of the positions table, rows are keyed by symbol
+POSITION_COLUMNS = (
+    ("Symbol", "symbol"),
+    ("Direction", "direction"),
+    ("Volume", "volume"),
+    ("Avg Price", "price"),
+    ("PnL", "pnl"),
+)
+
+# Pre-built markup for the positions table
+_DIRECTION_CELLS = {"LONG": "[bold green]LONG[/]", "SHORT": "[bold red]SHORT[/]"}
+_PNL_POS_FMT = "[green]+{:.2f}[/]".format
+_PNL_NEG_FMT = "[red]{:.2f}[/]".format
+
+
+@lru_cache(maxsize=1024)
+def _format_second(second: int) -> str:
+    """HH:MM:SS (UTC) of an epoch second, many trades share the same second."""
+    return time.strftime("%H:%M:%S", time.gmtime(second))
+
+
+def _trade_time(trade: dict) -> str:
+    """Time cell of a trade, from its 'time' field or its 'ts' in milliseconds."""
+    if "time" in trade:
+        return str(trade["time"])
+    ts = trade.get("ts")
+    return _format_second(int(ts) // 1000) if ts is not None else ""
+
+
+def _pnl_cell(pnl) -> str:
+    """Colored PnL cell, non-numeric values are shown as given."""
+    if not isinstance(pnl, (int, float)):
+        return str(pnl)
+    return _PNL_POS_FMT(pnl) if pnl >= 0 else _PNL_NEG_FMT(pnl)
+
 # Textual imports for building the TUI
 from textual.app import App, ComposeResult
 from textual.widgets import Header, Footer, Static, DataTable, Log
 from textual.containers import Horizontal, Vertical
+from rich.text import Text
 
 # --- Custom Widgets for Each Panel ---
 
@@ -20,6 +66,13 @@ class PositionsPanel(Static):
     A widget to display the user's current positions in a table.
     """
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # latest snapshot only, filled by the engine thread (also before mount) and taken by _flush
+        self._pending_positions = deque(maxlen=1)
+        # symbol -> cells currently shown, None until the first real snapshot
+        self._pos_rows = None
+
     def compose(self) -> ComposeResult:
         """
         Compose the content of the PositionsPanel.
@@ -32,8 +85,11 @@ class PositionsPanel(Static):
         Called when the widget is mounted.
         Initializes the table with headers and dummy data.
         """
+        self.set_interval(FLUSH_INTERVAL, self._flush)
+
         table = self.query_one(DataTable)
-        table.add_columns("Symbol", "Direction", "Volume", "Avg Price", "PnL")
+        for label, key in POSITION_COLUMNS:
+            table.add_column(label, key=key)
         
         # Add dummy data
         dummy_positions = [
@@ -51,10 +107,48 @@ class PositionsPanel(Static):
             positions (List[dict]): A list of dictionaries, where each dictionary
                                     represents a position's data.
         """
+        # Only the latest snapshot matters, it is drawn on the next flush.
+        self._pending_positions.append(positions)
+
+    def _flush(self) -> None:
+        """
+        Applies the latest snapshot to the positions table, if any arrived.
+        """
+        try:
+            positions = self._pending_positions.pop()
+        except IndexError:
+            return
+
+        incoming = {
+            pos.get("symbol", ""): (
+                _DIRECTION_CELLS.get(str(pos.get("direction", "")).upper(), pos.get("direction", "")),
+                f"{pos.get('volume', '')}",
+                f"{pos.get('price', '')}",
+                _pnl_cell(pos.get("pnl", "")),
+            )
+            for pos in positions
+        }
         table = self.query_one(DataTable)
-        table.clear()
-        # This method will clear the existing rows and add the new position data.
-        pass
+        with self.app.batch_update():
+            if self._pos_rows is None:
+                # drop the dummy rows once real data arrives
+                table.clear()
+                self._pos_rows = {}
+            shown = self._pos_rows
+            for symbol in shown.keys() - incoming.keys():
+                table.remove_row(symbol)
+                del shown[symbol]
+
+            # rows are keyed by symbol, only changed cells are rewritten
+            for symbol, cells in incoming.items():
+                old = shown.get(symbol)
+                if old is None:
+                    table.add_row(symbol, *cells, key=symbol)
+                elif old != cells:
+                    for (_, key), value, old_value in zip(POSITION_COLUMNS[1:], cells, old):
+                        if value != old_value:
+                            table.update_cell(symbol, key, value)
+                shown[symbol] = cells
 
 
 class OrderBookPanel(Static):
@@ -62,6 +156,14 @@ class OrderBookPanel(Static):
     A widget to display the order book (market depth) for a selected symbol.
     """
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # latest tick only, ticks may arrive before mount
+        self._pending_tick = deque(maxlen=1)
+        # price -> volume of the levels currently shown, None until the first real tick
+        self._bids = None
+        self._asks = None
+
     def compose(self) -> ComposeResult:
         """
         Compose the content of the OrderBookPanel.
@@ -77,11 +179,15 @@ class OrderBookPanel(Static):
         Called when the widget is mounted.
         Initializes the bid and ask tables with headers and dummy data.
         """
+        self.set_interval(FLUSH_INTERVAL, self._flush)
+
         bids_table = self.query_one("#bids", DataTable)
         asks_table = self.query_one("#asks", DataTable)
         
-        bids_table.add_columns("Price (BID)", "Volume")
-        asks_table.add_columns("Price (ASK)", "Volume")
+        bids_table.add_column("Price (BID)", key="price")
+        bids_table.add_column("Volume", key="volume")
+        asks_table.add_column("Price (ASK)", key="price")
+        asks_table.add_column("Volume", key="volume")
 
         # Add dummy data
         dummy_bids = [
@@ -107,8 +213,59 @@ class OrderBookPanel(Static):
             tick_data (dict): A dictionary containing the latest tick data,
                               including bids and asks.
         """
-        # This method will update the bid and ask tables.
-        pass
+        # Intermediate ticks between two flushes are never drawn.
+        self._pending_tick.append(tick_data)
+
+    def _flush(self) -> None:
+        """
+        Applies the latest tick to the bid and ask tables, if any arrived.
+        """
+        try:
+            tick_data = self._pending_tick.pop()
+        except IndexError:
+            return
+
+        bids_table = self.query_one("#bids", DataTable)
+        asks_table = self.query_one("#asks", DataTable)
+        with self.app.batch_update():
+            if self._bids is None:
+                # drop the dummy rows once real data arrives
+                bids_table.clear()
+                asks_table.clear()
+                self._bids, self._asks = {}, {}
+            self._apply_levels(bids_table, self._bids, tick_data.get("bids", ()), "green", True)
+            self._apply_levels(asks_table, self._asks, tick_data.get("asks", ()), "red", False)
+
+    @staticmethod
+    def _apply_levels(table: DataTable, shown: dict, levels, color: str, descending: bool) -> None:
+        """
+        Updates only the rows whose level was added, removed or changed volume.
+
+        Args:
+            table (DataTable): The bid or ask table, rows keyed by price.
+            shown (dict): price -> volume currently in the table, updated in place.
+            levels: Iterable of (price, volume) of the new snapshot.
+            color (str): Style of the price cells.
+            descending (bool): Sort order of the prices (True for bids).
+        """
+        new = dict(levels)
+        for price in shown.keys() - new.keys():
+            table.remove_row(str(price))
+            del shown[price]
+
+        added = False
+        for price, volume in new.items():
+            old = shown.get(price)
+            if old is None:
+                table.add_row(Text(str(price), style=color), str(volume), key=str(price))
+                added = True
+            elif old != volume:
+                table.update_cell(str(price), "volume", str(volume))
+            shown[price] = volume
+
+        if added:
+            # new rows are appended, restore price order
+            table.sort("price", key=lambda cell: float(cell.plain), reverse=descending)
 
 
 class TradesPanel(Static):
@@ -116,6 +273,11 @@ class TradesPanel(Static):
     A widget to display the latest market trades for a selected symbol.
     """
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # trades may arrive before mount, a burst beyond maxlen drops the oldest
+        self._pending_trades = deque(maxlen=MAX_PENDING_TRADES)
+
     def compose(self) -> ComposeResult:
         """
         Compose the content of the TradesPanel.
@@ -128,15 +290,17 @@ class TradesPanel(Static):
         Called when the widget is mounted.
         Initializes the trades table with headers and dummy data.
         """
+        self.set_interval(FLUSH_INTERVAL, self._flush)
+
         table = self.query_one(DataTable)
         table.add_columns("Time", "Price", "Volume", "Direction")
 
         # Add dummy data
-        now = datetime.now(timezone.utc)
+        now = _format_second(int(time.time()))
         dummy_trades = [
-            (now.strftime("%H:%M:%S"), "[red]68501.00[/]", "0.2", "[red]SELL[/]"),
-            (now.strftime("%H:%M:%S"), "[green]68500.50[/]", "0.1", "[green]BUY[/]"),
-            (now.strftime("%H:%M:%S"), "[red]68501.50[/]", "0.5", "[red]SELL[/]"),
+            (now, "[red]68501.00[/]", "0.2", "[red]SELL[/]"),
+            (now, "[green]68500.50[/]", "0.1", "[green]BUY[/]"),
+            (now, "[red]68501.50[/]", "0.5", "[red]SELL[/]"),
         ]
         for trade in dummy_trades:
             table.add_row(*trade)
@@ -148,8 +312,29 @@ class TradesPanel(Static):
         Args:
             trade_data (dict): A dictionary containing the new trade's data.
         """
-        # This method will add a new row to the DataTable.
-        pass
+        # Buffered, all trades since the last flush are added in one go.
+        self._pending_trades.append(trade_data)
+
+    def _flush(self) -> None:
+        """
+        Adds the trades buffered since the last flush to the table.
+        """
+        if not self._pending_trades:
+            return
+        trades = [self._pending_trades.popleft() for _ in range(len(self._pending_trades))]
+
+        rows = [
+            (
+                _trade_time(trade),
+                str(trade.get("price", "")),
+                str(trade.get("volume", "")),
+                trade.get("direction", ""),
+            )
+            for trade in trades
+        ]
+        table = self.query_one(DataTable)
+        with self.app.batch_update():
+            table.add_rows(rows)
 
 
 class LogPanel(Static):
@@ -157,6 +342,11 @@ class LogPanel(Static):
     A widget to display log messages from the trading engine and the TUI itself.
     """
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # messages may arrive before mount, a burst beyond maxlen drops the oldest
+        self._pending_lines = deque(maxlen=MAX_PENDING_LOG_LINES)
+
     def compose(self) -> ComposeResult:
         """
         Compose the content of the LogPanel.
@@ -164,15 +354,31 @@ class LogPanel(Static):
         """
         yield Log()
 
+    def on_mount(self) -> None:
+        """
+        Called when the widget is mounted.
+        Starts the timer that writes buffered messages to the log.
+        """
+        self.set_interval(LOG_FLUSH_INTERVAL, self._flush)
+
     def add_log_message(self, message: str) -> None:
         """
-        Writes a new message to the log.
+        Queues a new message for the log, it is written on the next flush.
 
         Args:
             message (str): The log message to display.
         """
-        log_widget = self.query_one(Log)
-        log_widget.write_line(message)
+        self._pending_lines.append(message)
+
+    def _flush(self) -> None:
+        """
+        Writes all messages queued since the last flush in one call.
+        """
+        if not self._pending_lines:
+            return
+        lines = [self._pending_lines.popleft() for _ in range(len(self._pending_lines))]
+        with self.app.batch_update():
+            self.query_one(Log).write_lines(lines)
 
 
 # --- Main Trading Application ---
@@ -188,6 +394,15 @@ class TradeApp(App):
         ("q", "quit", "Quit"),
     ]
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Panels are created here so the engine-thread handlers below can
+        # buffer data even before the app is composed and mounted
+        self._positions_panel = PositionsPanel(id="positions")
+        self._order_book_panel = OrderBookPanel(id="order_book")
+        self._trades_panel = TradesPanel(id="trades")
+        self._log_panel = LogPanel(id="log_ai")
+
     def compose(self) -> ComposeResult:
         """
         Compose the main layout of the application.
@@ -195,13 +410,13 @@ class TradeApp(App):
         yield Header()
         yield Horizontal(
             Vertical(
-                PositionsPanel(id="positions"),
-                LogPanel(id="log_ai"),
+                self._positions_panel,
+                self._log_panel,
                 classes="column",
             ),
             Vertical(
-                OrderBookPanel(id="order_book"),
-                TradesPanel(id="trades"),
+                self._order_book_panel,
+                self._trades_panel,
                 classes="column",
             ),
         )
@@ -212,9 +427,8 @@ class TradeApp(App):
         Called when the application is mounted.
         """
         # Add initial log messages
-        log_panel = self.query_one(LogPanel)
-        log_panel.add_log_message("TUI Application Started.")
-        log_panel.add_log_message("Waiting for engine connection...")
+        self._log_panel.add_log_message("TUI Application Started.")
+        self._log_panel.add_log_message("Waiting for engine connection...")
         
         # For now, we are not starting the real engine.
         # self.start_engine_thread()
@@ -226,34 +440,32 @@ class TradeApp(App):
         pass
 
     # --- Event Handlers from Engine ---
+    # Safe to call from the engine thread: they only append to the panels'
+    # deques, the widgets are touched by the panels' timers on the app loop.
 
     def on_position_update(self, event_data: dict) -> None:
         """
         Handles position update events from the engine.
         """
-        positions_panel = self.query_one(PositionsPanel)
-        positions_panel.update_positions(event_data['positions'])
+        self._positions_panel.update_positions(event_data['positions'])
 
     def on_tick_update(self, event_data: dict) -> None:
         """
         Handles tick update events from the engine.
         """
-        order_book_panel = self.query_one(OrderBookPanel)
-        order_book_panel.update_order_book(event_data['tick'])
+        self._order_book_panel.update_order_book(event_data['tick'])
 
     def on_trade_update(self, event_data: dict) -> None:
         """
         Handles new trade events from the engine.
         """
-        trades_panel = self.query_one(TradesPanel)
-        trades_panel.add_trade(event_data['trade'])
+        self._trades_panel.add_trade(event_data['trade'])
 
     def on_log_message(self, event_data: dict) -> None:
         """
         Handles log messages from the engine.
         """
-        log_panel = self.query_one(LogPanel)
-        log_panel.add_log_message(event_data['message'])
+        self._log_panel.add_log_message(event_data['message'])
 
 
 if __name__ == "__main__":
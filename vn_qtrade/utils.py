@@ -1,9 +1,52 @@
 import pytz
+import json
 import datetime
+from functools import lru_cache
+from operator import attrgetter
 from typing import Sequence, Any, Callable
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
+from pandas.tseries.frequencies import to_offset
+
+from vnpy_evo.trader.utility import get_file_path, extract_vt_symbol as _extract_vt_symbol
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# caches below are keyed by (class, field names): gateways add attributes
+# (e.g. lever, pnlRatio on positions), so one class can have several layouts
+# attrgetter over all fields per layout
+_GETTER_CACHE = {}
+# {field: dtype} of the columns built with a native dtype, per layout
+_SCHEMA_CACHE = {}
+
+
+def get_fields(sample: Any) -> tuple:
+    """
+    Return the attribute names of an object (vnpy objects also set attributes
+    like vt_symbol in __post_init__, so they are read from the instance).
+    """
+    return tuple(sample.__dict__)
+
+
+def get_schema(key: tuple, sample: Any) -> dict:
+    """
+    Return {field: dtype} for the columns of a data class that get a native
+    dtype: float fields become float64, other columns are inferred by pandas.
+    """
+    schema = _SCHEMA_CACHE.get(key)
+    if schema is None:
+        schema = {}
+        for name, value in sample.__dict__.items():
+            if isinstance(value, float):
+                schema[name] = np.float64
+        _SCHEMA_CACHE[key] = schema
+    return schema
+
 
 def to_df(data_list: Sequence):
     """
@@ -12,17 +55,79 @@ def to_df(data_list: Sequence):
     if not data_list:
         return None
 
-    dict_list = [data.__dict__ for data in data_list if data is not None]
-    df = DataFrame(dict_list)
-    if 'datetime' in df.columns:
-        df.index = df.datetime
-    return df
+    data_list = [data for data in data_list if data is not None]
+    if not data_list:
+        return DataFrame()
 
-def get_data(func: Callable, arg: Any = None, use_df: bool = True):
+    # build one column per field instead of one dict per object
+    sample = data_list[0]
+    fields = get_fields(sample)
+    key = (type(sample), fields)
+    getter = _GETTER_CACHE.get(key)
+    if getter is None:
+        getter = _GETTER_CACHE[key] = attrgetter(*fields)
+    try:
+        if len(fields) > 1:
+            # one C-level attrgetter call per object, transposed into columns by zip
+            cols = dict(zip(fields, map(list, zip(*map(getter, data_list)))))
+        else:
+            cols = {fields[0]: list(map(getter, data_list))}
+    except AttributeError:
+        # objects of the batch have different attributes, take the union, missing are None
+        fields = tuple(dict.fromkeys(name for data in data_list for name in data.__dict__))
+        key = (type(sample), fields)
+        cols = {name: [getattr(data, name, None) for data in data_list] for name in fields}
+
+    # numeric columns go straight into float64 arrays instead of being inferred
+    n = len(data_list)
+    for name, dtype in get_schema(key, sample).items():
+        try:
+            cols[name] = np.fromiter(cols[name], dtype=dtype, count=n)
+        except (TypeError, ValueError):
+            # a None or non-numeric value, keep the inferred column
+            pass
+    # index by datetime at construction, keeping the column as before
+    index = pd.Index(cols['datetime'], name='datetime') if 'datetime' in cols else None
+    return DataFrame(cols, index=index, copy=False)
+
+@lru_cache(maxsize=4096)
+def extract_vt_symbol(vt_symbol: str) -> tuple:
+    """
+    Cached vnpy extract_vt_symbol, engines only trade a small set of symbols.
+    """
+    return _extract_vt_symbol(vt_symbol)
+
+def load_json(filename: str) -> dict:
+    """
+    Load data from a json file in the trader dir, create an empty one if missing
+    (same behaviour as vnpy's load_json, parsed with orjson when installed).
+    """
+    filepath = get_file_path(filename)
+    if not filepath.exists():
+        save_json(filename, {})
+        return {}
+
+    data = filepath.read_bytes()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def save_json(filename: str, data: dict) -> None:
+    """
+    Save data into a json file in the trader dir.
+    """
+    filepath = get_file_path(filename)
+    if orjson:
+        filepath.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        filepath.write_text(json.dumps(data, indent=4, ensure_ascii=False), encoding="UTF-8")
+
+# marks "no argument" for get_data/get_one/get_many, so falsy args like 0 or "" are still passed
+_MISSING = object()
+
+def get_data(func: Callable, arg: Any = _MISSING, use_df: bool = True):
     """
     Helper function to call a function and optionally convert to DataFrame.
     """
-    if not arg:
+    if arg is _MISSING:
         data = func()
     else:
         data = func(arg)
@@ -36,15 +141,60 @@ def get_data(func: Callable, arg: Any = None, use_df: bool = True):
             data = [data]
         return to_df(data)
 
+def get_one(func: Callable, arg: Any = _MISSING, use_df: bool = False):
+    """
+    Look up a single object, only wrap it in a DataFrame when asked to.
+    """
+    data = func() if arg is _MISSING else func(arg)
+    if not use_df or data is None:
+        return data
+    return to_df([data])
+
+def get_many(func: Callable, arg: Any = _MISSING, use_df: bool = True):
+    """
+    Fetch a list of objects and optionally convert to DataFrame.
+    """
+    data = func() if arg is _MISSING else func(arg)
+    if not use_df:
+        return data
+    return to_df(data)
+
 def kline_to_dataframe(kline_arr) -> pd.DataFrame:
     """
     Parse kline to pd.DataFrame with datetime index
     """
-    df = pd.DataFrame(kline, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
-    df['datetime'] = pd.to_datetime(df['ts'], unit='ms')
-    df.index = df['datetime']
-    del df['datetime']
-    return df
+    # one float64 block for all rows, missing values become nan
+    arr = np.asarray(kline_arr, dtype=np.float64).reshape(-1, 6)
+    ts = arr[:, 0].astype(np.int64)
+    return pd.DataFrame(
+        {
+            'ts': ts,
+            'open': arr[:, 1],
+            'high': arr[:, 2],
+            'low': arr[:, 3],
+            'close': arr[:, 4],
+            'volume': arr[:, 5],
+        },
+        # ms epoch reinterpreted as datetime64[ns] in place of to_datetime parsing
+        index=pd.DatetimeIndex((ts * 1_000_000).view('datetime64[ns]'), name='datetime')
+    )
+
+# aggregation of each kline column when resampling
+_OHLC_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+    # 'quote_volume': 'sum'
+}
+
+@lru_cache(maxsize=64)
+def _resample_offset(_freq: str):
+    """
+    Parsed resample offset of a frequency string, the same few are requested repeatedly.
+    """
+    return to_offset('MS' if _freq == '1M' else _freq)
 
 def kline_resample(_df: pd.DataFrame, _freq: str) -> pd.DataFrame:
     """
@@ -55,42 +205,25 @@ def kline_resample(_df: pd.DataFrame, _freq: str) -> pd.DataFrame:
     """
     if _df is None:
         return None
-    if _freq == '1M':
-        freq = 'MS'
-    # elif _freq == '1min':
-    #    return _df
-    else:
-        freq = _freq
-    ohlc = {
-        'open': 'first',
-        'high': 'max',
-        'low': 'min',
-        'close': 'last',
-        'volume': 'sum',
-        # 'quote_volume': 'sum'
-    }
+    freq = _resample_offset(_freq)
     # 先保存交易量，否则填充之后就无法过滤
     # 排除掉交易量为0的k线
-    _df = _df[_df['volume'] != 0]
-    df_unfill = _df.resample(freq, closed='right', label='right').agg(ohlc)
-    # only close column will be used
-    df = _df.resample(freq, closed='right', label='right').apply(ohlc).ffill()
-    closes = df['close']
-    df['open'] = df_unfill['open'].combine_first(closes)
-    df['high'] = df_unfill['high'].combine_first(closes)
-    df['low'] = df_unfill['low'].combine_first(closes)
-    df['close'] = df_unfill['close'].combine_first(closes)
-    # remove ffilled volume values
-    # del df['volume']
-    # replace the correct volume value
-    df['volume'] = df_unfill['volume']
-    # fill the NAN with zero
+    # positional gather on the raw volume buffer, no boolean Series to align
+    _df = _df.iloc[np.flatnonzero(_df['volume'].to_numpy())]
+    # one resample pass, empty bars take the last non-empty close for all prices
+    df = _df.resample(freq, closed='right', label='right').agg(_OHLC_AGG)
+    closes = df['close'].ffill()
+    for col in ('open', 'high', 'low', 'close'):
+        df[col] = df[col].fillna(closes)
+    # fill the NAN volume with zero
     df['volume'] = df['volume'].fillna(0)
-    df['exchange'] = _df.iloc[0]['exchange']
+    # metadata is constant per frame, read it from a single row of the three columns
+    exchange, base, quote = _df[['exchange', 'base_symbol', 'quote_symbol']].iloc[0]
+    df['exchange'] = exchange
     df['frequency'] = _freq
-    df['base'] = _df.iloc[0]['base_symbol']
-    df['quote'] = _df.iloc[0]['quote_symbol']
-    rebuild_ts = [int(pd.datetime.timestamp(i)) for i in df.index]
-    df['ts'] = rebuild_ts
+    df['base'] = base
+    df['quote'] = quote
+    # epoch seconds straight from the int64 ns buffer of the index
+    df['ts'] = df.index.asi8 // 1_000_000_000
 
     return df